@@ -0,0 +1,99 @@
+from datetime import datetime
+
+import pytest
+from dateutil import rrule
+from django.template.loader import render_to_string
+from django.urls import reverse
+
+from jivetime import utils, views
+from jivetime.forms import MultipleOccurrenceForm
+from jivetime.models import Event, Occurrence, occurrence_times
+
+pytestmark = pytest.mark.django_db
+
+
+def bench_create_timeslot_table(benchmark, dataset):
+    benchmark(utils.create_timeslot_table, dataset.day, dataset.group.id)
+
+
+def bench_daily_occurrences(benchmark, dataset):
+    def daily_occurrences():
+        return list(
+            Occurrence.objects.daily_occurrences(dataset.day).select_related("event")
+        )
+
+    benchmark(daily_occurrences)
+
+
+def bench_month_view(benchmark, rf, dataset):
+    request = rf.get("/")
+    response = benchmark(
+        views.month_view, request, gid=dataset.group.id, year=dataset.year, month=6
+    )
+    assert response.status_code == 200
+
+
+def bench_year_view(benchmark, rf, dataset):
+    request = rf.get("/")
+    response = benchmark(
+        views.year_view, request, gid=dataset.group.id, year=dataset.year
+    )
+    assert response.status_code == 200
+
+
+def bench_month_grid_rendering(benchmark, client, dataset):
+    response = client.get(
+        reverse("jivetime:calendar-month", args=[dataset.group.id, dataset.year, 6])
+    )
+    template = response.templates[0].name
+    context = response.context[0].flatten()
+    benchmark(render_to_string, template, context, response.wsgi_request)
+
+
+@pytest.mark.parametrize("count", [1000, 10000, 100000])
+def bench_add_occurrences(benchmark, group, count):
+    def setup():
+        return (Event.objects.create(title="bench", group=group),), {}
+
+    def add_occurrences(event):
+        event.add_occurrences(
+            datetime(2024, 1, 1, 9),
+            datetime(2024, 1, 1, 10),
+            freq=rrule.DAILY,
+            count=count,
+        )
+
+    benchmark.pedantic(add_occurrences, setup=setup, rounds=3)
+
+
+@pytest.mark.parametrize(
+    "freq,count",
+    [(rrule.DAILY, 1000), (rrule.WEEKLY, 1000), (rrule.MONTHLY, 1000)],
+    ids=["daily", "weekly", "monthly"],
+)
+def bench_build_rrule_params(benchmark, freq, count):
+    form = MultipleOccurrenceForm(
+        {
+            "day": "2024-01-01",
+            "start_time_delta": "28800",
+            "end_time_delta": "32400",
+            "repeats": "count",
+            "count": count,
+            "freq": freq,
+            "interval": 1,
+            "week_days": ["1", "3", "5"],
+            "month_option": "on",
+            "month_ordinal": "1",
+            "month_ordinal_day": "2",
+            "year_month_ordinal": "1",
+            "year_month_ordinal_day": "1",
+        }
+    )
+    assert form.is_valid(), form.errors
+    data = form.cleaned_data
+
+    def expand():
+        params = form._build_rrule_params(data)
+        return occurrence_times(data["start_time"], data["end_time"], **params)
+
+    assert len(benchmark(expand)) == count
@@ -0,0 +1,33 @@
+import os
+from collections import namedtuple
+from datetime import datetime
+
+import pytest
+from django.contrib.auth import get_user_model
+
+from jivetime.dataset import generate
+from jivetime.models import EventGroup
+
+# Occurrence counts of the generated datasets, e.g. JIVETIME_BENCH_SIZES=1000000
+SIZES = [
+    int(size)
+    for size in os.environ.get("JIVETIME_BENCH_SIZES", "1000,10000").split(",")
+]
+
+Dataset = namedtuple("Dataset", "group size year day")
+
+
+@pytest.fixture(scope="session", params=SIZES, ids="{}occ".format)
+def dataset(request, django_db_setup, django_db_blocker):
+    # every dataset gets a year of its own, so day queries only see its rows
+    year = 2001 + SIZES.index(request.param)
+    with django_db_blocker.unblock():
+        [group] = generate(occurrences=request.param, seed=request.param, year=year)
+
+    return Dataset(group, request.param, year, datetime(year, 6, 14))
+
+
+@pytest.fixture
+def group(db):
+    owner = get_user_model().objects.create(username="bench")
+    return EventGroup.objects.create(name="bench", owner=owner, timezone="UTC")
@@ -0,0 +1,28 @@
+"""
+Settings for the benchmark suite: the demo project, on PostgreSQL if
+JIVETIME_BENCH_POSTGRES is set, connecting with the libpq PG* variables.
+"""
+import os
+
+from demo.settings import *  # noqa: F401,F403
+
+if os.environ.get("JIVETIME_BENCH_POSTGRES"):
+    DATABASES = {
+        "default": {
+            "ENGINE": "django.db.backends.postgresql",
+            "HOST": os.environ.get("PGHOST", "localhost"),
+            "PORT": os.environ.get("PGPORT", "5432"),
+            "NAME": os.environ.get("PGDATABASE", "jivetime"),
+            "USER": os.environ.get("PGUSER", "jivetime"),
+            "PASSWORD": os.environ.get("PGPASSWORD", "jivetime"),
+        }
+    }
+
+# measure the views, not the instrumentation
+_instrumentation = (
+    "jivetime.timing.ServerTimingMiddleware",
+    "jivetime.profiling.ProfilingMiddleware",
+)
+MIDDLEWARE = tuple(
+    name for name in MIDDLEWARE if name not in _instrumentation  # noqa: F405
+)
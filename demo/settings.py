@@ -21,7 +21,16 @@ DATABASES = {
     "default": {
         "ENGINE": "django.db.backends.sqlite3",
         "NAME": "karate.db",
-    }
+    },
+    # more databases to try the jivetime.routers routers against
+    "replica": {
+        "ENGINE": "django.db.backends.sqlite3",
+        "NAME": "karate-replica.db",
+    },
+    "shard": {
+        "ENGINE": "django.db.backends.sqlite3",
+        "NAME": "karate-shard.db",
+    },
 }
 LANGUAGES = (("en", "English"),)
 STATIC_URL = "/static/"
@@ -72,6 +81,8 @@ MIDDLEWARE = (
     "django.contrib.auth.middleware.AuthenticationMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
+    "jivetime.timing.ServerTimingMiddleware",
+    "jivetime.profiling.ProfilingMiddleware",
 )
 
 JIVETIME = {
@@ -1,13 +1,40 @@
-from django.contrib import admin
+from django.contrib import admin, messages
+from django.contrib.admin import helpers
 from django.contrib.contenttypes.admin import GenericTabularInline
+from django.db import transaction
+from django.template.response import TemplateResponse
+from django.utils import timezone
+from django.utils.translation import gettext_lazy as _
 
-from .models import Event, EventGroup, EventType, Note, Occurrence
+from .forms import ShiftOccurrencesForm
+from .models import (
+    Event,
+    EventGroup,
+    EventType,
+    Note,
+    Occurrence,
+    ReminderDelivery,
+    Series,
+)
+from .utils import conflicting_times
 
 
 class EventTypeAdmin(admin.ModelAdmin):
     list_display = ("label", "abbr")
 
 
+class SeriesAdmin(admin.ModelAdmin):
+    list_display = ("event", "rule", "duration", "created")
+    list_select_related = ("event",)
+
+
+class ReminderDeliveryAdmin(admin.ModelAdmin):
+    list_display = ("occurrence", "lead", "status", "created", "delivered")
+    list_filter = ("status",)
+    list_select_related = ("occurrence__event",)
+    raw_id_fields = ("occurrence",)
+
+
 class OccurrenceInline(admin.TabularInline):
     model = Occurrence
     extra = 1
@@ -18,13 +45,89 @@ class EventNoteInline(GenericTabularInline):
     extra = 1
 
 
+def _shift_conflicts(queryset, delta, from_time=None) -> list:
+    """
+    Return ``(start_time, end_time, occurrence)`` triples for every occurrence
+    of the events of ``queryset`` that would overlap an occurrence of its
+    event group if all of them were shifted by ``delta`` together.
+    """
+    moved = Occurrence.objects.using(queryset.db).filter(
+        event__in=queryset.values("pk")
+    )
+    if from_time is not None:
+        moved = moved.filter(start_time__gte=from_time)
+
+    # the moved occurrences keep their relative positions, so only those left
+    # in place can conflict with them
+    times = {}
+    for group_id, st, et in moved.order_by("start_time").values_list(
+        "event__group", "start_time", "end_time"
+    ):
+        times.setdefault(group_id, []).append((st + delta, et + delta))
+
+    conflicts = []
+    manager = Occurrence.objects.db_manager(queryset.db)
+    for group_id, group_times in times.items():
+        others = manager.range_occurrences(
+            group_times[0][0],
+            max(et for _, et in group_times),
+            group_id,
+            archive=False,
+        ).exclude(pk__in=moved.values("pk"))
+        conflicts.extend(conflicting_times(group_times, others))
+
+    return conflicts
+
+
 class EventAdmin(admin.ModelAdmin):
     list_display = ("title", "event_type", "description")
     list_filter = ("event_type",)
     search_fields = ("title", "description")
     inlines = [EventNoteInline, OccurrenceInline]
+    actions = ["shift_occurrences"]
+
+    def shift_occurrences(self, request, queryset):
+        form = ShiftOccurrencesForm(request.POST if "apply" in request.POST else None)
+        if form.is_valid():
+            delta = form.cleaned_data["delta"]
+            from_time = timezone.now() if form.cleaned_data["future_only"] else None
+            with transaction.atomic(using=queryset.db):
+                conflicts = _shift_conflicts(queryset, delta, from_time)
+                if conflicts:
+                    self.message_user(
+                        request,
+                        _("%(count)d occurrence(s) would conflict with %(title)s")
+                        % {"count": len(conflicts), "title": conflicts[0][2].title},
+                        messages.ERROR,
+                    )
+                    return None
+
+                count = sum(
+                    event.shift_occurrences(delta, from_time, check_conflicts=False)
+                    for event in queryset
+                )
+
+            self.message_user(request, _("%d occurrence(s) moved.") % count)
+            return None
+
+        return TemplateResponse(
+            request,
+            "admin/jivetime/event/shift_occurrences.html",
+            {
+                **self.admin_site.each_context(request),
+                "title": _("Move occurrences"),
+                "opts": self.model._meta,
+                "form": form,
+                "events": queryset,
+                "action_checkbox_name": helpers.ACTION_CHECKBOX_NAME,
+            },
+        )
+
+    shift_occurrences.short_description = _("Move occurrences of selected events")
 
 
 admin.site.register(EventGroup)
 admin.site.register(Event, EventAdmin)
 admin.site.register(EventType, EventTypeAdmin)
+admin.site.register(Series, SeriesAdmin)
+admin.site.register(ReminderDelivery, ReminderDeliveryAdmin)
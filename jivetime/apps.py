@@ -0,0 +1,8 @@
+from django.apps import AppConfig
+from django.utils.translation import gettext_lazy as _
+
+
+class JivetimeConfig(AppConfig):
+    name = "jivetime"
+    verbose_name = _("Jivetime")
+    default_auto_field = "django.db.models.BigAutoField"
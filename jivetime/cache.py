@@ -0,0 +1,166 @@
+"""
+Cache helpers for jivetime
+"""
+import time
+from datetime import datetime
+from typing import TYPE_CHECKING, Optional
+
+from django.core.cache import caches
+from django.db.models import Max
+
+from .conf import jivetime_settings
+from .metrics import get_metrics
+from .routers import group_databases
+
+if TYPE_CHECKING:
+    from .models import EventType
+
+
+def get_cache():
+    return caches[jivetime_settings.CACHE_ALIAS]
+
+
+def _group_version_key(group_id) -> str:
+    return "jivetime:group-version:{}".format(group_id)
+
+
+def group_version(group_id) -> int:
+    """
+    Return the current cache version for the event group keyed by ``group_id``.
+
+    Versions are seeded from the clock so that an evicted version key never
+    resurrects entries that were cached under an earlier version.
+    """
+    cache = get_cache()
+    key = _group_version_key(group_id)
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, time.time_ns(), None)
+        version = cache.get(key)
+
+    return version
+
+
+def bump_group_version(group_id) -> None:
+    """
+    Invalidate all cached values derived from the occurrences of a group.
+    """
+    cache = get_cache()
+    key = _group_version_key(group_id)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, time.time_ns(), None)
+
+
+_ARCHIVE_CUTOFF_KEY = "jivetime:archive-cutoff"
+
+
+def archive_cutoff() -> Optional[datetime]:
+    """
+    Return the end time of the latest archived occurrence, or ``None`` if
+    nothing has been archived. Ranges starting at or after the cutoff never
+    need to consult the archive.
+    """
+    cached = get_cache().get(_ARCHIVE_CUTOFF_KEY)
+    get_metrics().increment(
+        "jivetime_cache_requests_total",
+        cache="archive_cutoff",
+        result="miss" if cached is None else "hit",
+    )
+    if cached is None:
+        cached = refresh_archive_cutoff()
+
+    return cached[0]
+
+
+def refresh_archive_cutoff() -> tuple:
+    """
+    Recompute the archive cutoff after occurrences have been archived, over
+    every database holding events.
+    """
+    from .models import OccurrenceArchive
+
+    cutoffs = [
+        OccurrenceArchive.objects.using(alias).aggregate(cutoff=Max("end_time"))[
+            "cutoff"
+        ]
+        for alias in group_databases()
+    ]
+    cutoff = max((c for c in cutoffs if c is not None), default=None)
+    cached = (cutoff,)
+    get_cache().set(_ARCHIVE_CUTOFF_KEY, cached, None)
+    return cached
+
+
+class EventTypeRegistry:
+    """
+    Process-local copy of all ``EventType`` rows, looked up by id or abbr.
+
+    The rows are loaded once and reloaded only when the shared version key in
+    the cache backend changes, which ``invalidate`` does on every save or
+    delete. The version key is checked at most once every
+    ``EVENT_TYPE_REGISTRY_TTL`` seconds.
+    """
+
+    version_key = "jivetime:event-type-version"
+
+    def __init__(self):
+        self._by_id: dict = {}
+        self._by_abbr: dict = {}
+        self._version = None
+        self._checked = 0.0
+
+    def _refresh(self):
+        now = time.monotonic()
+        ttl = jivetime_settings.EVENT_TYPE_REGISTRY_TTL
+        if self._version is not None and now - self._checked < ttl:
+            return
+
+        cache = get_cache()
+        version = cache.get(self.version_key)
+        if version is None:
+            cache.add(self.version_key, time.time_ns(), None)
+            version = cache.get(self.version_key)
+
+        get_metrics().increment(
+            "jivetime_cache_requests_total",
+            cache="event_types",
+            result="hit" if version == self._version else "miss",
+        )
+        if version != self._version:
+            from .models import EventType
+
+            event_types = list(EventType.objects.all())
+            self._by_id = {et.pk: et for et in event_types}
+            self._by_abbr = {et.abbr: et for et in event_types}
+            self._version = version
+
+        self._checked = now
+
+    def all(self) -> list:
+        self._refresh()
+        return sorted(self._by_id.values(), key=lambda et: et.label)
+
+    def get(self, pk) -> Optional["EventType"]:
+        self._refresh()
+        return self._by_id.get(pk)
+
+    def get_by_abbr(self, abbr: str) -> Optional["EventType"]:
+        self._refresh()
+        return self._by_abbr.get(abbr)
+
+    def invalidate(self):
+        """
+        Force every process to reload its registry on the next lookup.
+        """
+        cache = get_cache()
+        try:
+            cache.incr(self.version_key)
+        except ValueError:
+            cache.set(self.version_key, time.time_ns(), None)
+
+        self._version = None
+
+
+event_types = EventTypeRegistry()
@@ -33,6 +33,75 @@ DEFAULT_SETTINGS = {
     "EVENT_GROUP_MODEL": "jivetime.EventGroup",
     "FORM_EVENT": "jivetime.forms.EventForm",
     "FORM_RECURRENCE": "jivetime.forms.MultipleOccurrenceForm",
+    # If True, occurrence forms reject new or updated occurrences that overlap
+    # existing occurrences within the same event group.
+    "CHECK_CONFLICTS": False,
+    # The Django cache alias used for jivetime's cached computations.
+    "CACHE_ALIAS": "default",
+    # Number of seconds free/busy results are cached; entries are also
+    # invalidated whenever the occurrences of a group change.
+    "FREE_BUSY_CACHE_TIMEOUT": 300,
+    # Maximum number of occurrences inserted per statement when expanding
+    # recurrences.
+    "OCCURRENCE_BATCH_SIZE": 500,
+    # Maximum number of seconds a process may serve event types from its local
+    # registry before checking the cache backend for changes made elsewhere.
+    "EVENT_TYPE_REGISTRY_TTL": 5,
+    # Number of rows per page for keyset paginated listings.
+    "PAGE_SIZE": 50,
+    # How far ahead of the current time occurrences of recurrences without a
+    # count or until date are created; see the jivetime_extend_series command.
+    "MATERIALIZE_HORIZON": datetime.timedelta(days=90),
+    # How long before an occurrence starts its reminders are sent; one reminder
+    # is sent per lead time.
+    "REMINDER_LEADS": (datetime.timedelta(minutes=15),),
+    # How far ahead of the current time the reminder scheduler loads due
+    # reminders into memory, and how often (in seconds) it reloads them.
+    "REMINDER_HORIZON": datetime.timedelta(minutes=10),
+    "REMINDER_POLL_INTERVAL": 60,
+    # Dotted path to a callable taking an occurrence and a lead time that
+    # delivers a single reminder, e.g. by email or webhook.
+    "REMINDER_BACKEND": "jivetime.scheduler.log_reminder",
+    # Number of threads delivering reminders concurrently.
+    "REMINDER_WORKERS": 4,
+    # How long a claimed reminder may stay pending before another scheduler
+    # claims it again, as the process sending it may have died.
+    "REMINDER_CLAIM_TIMEOUT": datetime.timedelta(minutes=5),
+    # Database alias the read-only calendar views read from when
+    # jivetime.routers.ReplicaRouter is installed, or None to read from the
+    # default database.
+    "REPLICA_DATABASE": None,
+    # Number of seconds a client reads from the default database after
+    # submitting a change, so it does not miss its own writes on a lagging
+    # replica.
+    "READ_YOUR_WRITES_SECONDS": 10,
+    # Database aliases the events of event groups are spread over by a hash of
+    # the group primary key when jivetime.routers.GroupShardRouter is
+    # installed, or None to keep them on the default database.
+    "SHARDS": None,
+    # A mapping of event group primary keys to database aliases, taking
+    # precedence over SHARDS.
+    "SHARD_MAP": {},
+    # Whether the database enforces the foreign keys of events to their event
+    # group and event type. Sharding events with GroupShardRouter requires
+    # False, as the constraints cannot span databases; set it before running
+    # the migrations and do not change it afterwards.
+    "EVENT_FOREIGN_KEY_CONSTRAINTS": True,
+    # Dotted path to the jivetime.metrics.Metrics subclass collecting
+    # jivetime's counters and histograms.
+    "METRICS_BACKEND": "jivetime.metrics.InMemoryMetrics",
+    # Directory jivetime.profiling.ProfilingMiddleware writes profiles of
+    # jivetime views to, or None to disable profiling.
+    "PROFILE_DIR": None,
+    # Fraction of the requests to jivetime views that are profiled.
+    "PROFILE_SAMPLE_RATE": 0.0,
+    # Number of seconds above which a request is profiled, or None. Setting a
+    # threshold runs every request under the profiler, keeping only the
+    # profiles of the slow ones.
+    "PROFILE_THRESHOLD": None,
+    # "cprofile" to profile function calls, or "tracemalloc" to profile
+    # memory allocations.
+    "PROFILER": "cprofile",
 }
 
 _user_settings = getattr(settings, "JIVETIME", {})
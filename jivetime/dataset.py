@@ -0,0 +1,136 @@
+"""
+Synthetic calendar data for benchmarks and load tests
+"""
+import random
+from datetime import datetime, timedelta
+from typing import Optional
+
+from dateutil import rrule
+from django.apps import apps
+from django.contrib.auth import get_user_model
+
+from .conf import jivetime_settings
+from .models import create_events_bulk
+
+EVENT_TYPES = [("bnch{}".format(n), "Benchmark type {}".format(n)) for n in range(1, 6)]
+
+# Number of events created per create_events_bulk transaction.
+EVENTS_PER_BATCH = 1000
+
+# Relative weights of the kinds of generated events, and the range of their
+# occurrence counts.
+RECURRENCES = {
+    "single": (15, (1, 1)),
+    "daily": (25, (5, 60)),
+    "weekly": (35, (4, 52)),
+    "monthly": (15, (3, 24)),
+    "multi-day": (10, (1, 8)),
+}
+
+# Popular start times, so that a share of the occurrences overlap.
+BUSY_SLOTS = [(9, 0), (10, 0), (13, 0), (14, 30)]
+
+
+def _event_spec(group, number: int, rng: random.Random, year: int) -> dict:
+    kind = rng.choices(list(RECURRENCES), [w for w, c in RECURRENCES.values()])[0]
+    if rng.random() < 0.3:
+        hour, minute = rng.choice(BUSY_SLOTS)
+    else:
+        hour, minute = rng.randint(7, 18), rng.choice((0, 15, 30, 45))
+
+    start_time = datetime(year, 1, 1, hour, minute) + timedelta(
+        days=rng.randint(0, 300)
+    )
+    if kind == "multi-day":
+        duration = timedelta(days=rng.randint(1, 3), hours=rng.randint(0, 8))
+    else:
+        duration = timedelta(minutes=rng.choice((15, 30, 45, 60, 90, 120)))
+
+    spec = dict(
+        title="{} event {}".format(kind.capitalize(), number),
+        event_type=rng.choice(EVENT_TYPES),
+        group=group,
+        start_time=start_time,
+        end_time=start_time + duration,
+    )
+    count = rng.randint(*RECURRENCES[kind][1])
+    if kind == "daily":
+        spec.update(freq=rrule.DAILY, count=count)
+    elif kind == "monthly":
+        spec.update(freq=rrule.MONTHLY, count=count)
+    elif count > 1:
+        spec.update(freq=rrule.WEEKLY, count=count)
+
+    return spec
+
+
+def event_specs(
+    group,
+    rng: random.Random,
+    year: int,
+    events: Optional[int] = None,
+    occurrences: Optional[int] = None,
+):
+    """
+    Yield ``create_event`` keyword arguments for ``events`` events of
+    ``group``, or for as many as add up to exactly ``occurrences``
+    occurrences, starting during ``year``.
+
+    The events mix one-off, daily, weekly, monthly and multi-day recurrences.
+    Start times are drawn from quarter hours of the working day, and a share
+    of them from a few popular slots, so that occurrences overlap.
+    """
+    number = 0
+    remaining = occurrences
+    while (events is None or number < events) and (remaining is None or remaining):
+        number += 1
+        spec = _event_spec(group, number, rng, year)
+        if remaining is not None:
+            count = min(spec.get("count", 1), remaining)
+            if count == 1:
+                spec.pop("freq", None)
+                spec.pop("count", None)
+            else:
+                spec["count"] = count
+            remaining -= count
+
+        yield spec
+
+
+def generate(
+    groups: int = 1,
+    events: Optional[int] = None,
+    occurrences: Optional[int] = None,
+    seed: int = 0,
+    year: int = 2024,
+    batch_size: int = EVENTS_PER_BATCH,
+) -> list:
+    """
+    Create ``groups`` new event groups of the ``EVENT_GROUP_MODEL`` model,
+    each with ``events`` events or with events adding up to ``occurrences``
+    occurrences, see ``event_specs``. Events are inserted with
+    ``create_events_bulk`` in batches of ``batch_size``. The same ``seed``
+    always yields the same events.
+
+    Returns the list of new groups.
+    """
+    rng = random.Random(seed)
+    group_model = apps.get_model(jivetime_settings.EVENT_GROUP_MODEL)
+    owner, created = get_user_model().objects.get_or_create(username="jivetime")
+    created_groups = []
+    for number in range(groups):
+        group = group_model.objects.create(
+            name="Generated group {}".format(number + 1), owner=owner, timezone="UTC"
+        )
+        specs = []
+        for spec in event_specs(group, rng, year, events, occurrences):
+            specs.append(spec)
+            if len(specs) >= batch_size:
+                create_events_bulk(specs)
+                specs = []
+
+        if specs:
+            create_events_bulk(specs)
+        created_groups.append(group)
+
+    return created_groups
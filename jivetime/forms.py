@@ -3,14 +3,19 @@ Convenience forms for adding and updating ``Event`` and ``Occurrence``s.
 """
 from datetime import date, datetime, time, timedelta
 
+import pytz
 from dateutil import rrule
 from django import forms
+from django.forms.models import ModelChoiceIterator
 from django.forms.utils import to_current_timezone
 from django.forms.widgets import SelectDateWidget
+from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
 
+from . import utils
+from .cache import event_types
 from .conf import jivetime_settings
-from .models import Event, Occurrence
+from .models import Event, EventType, Occurrence, occurrence_times
 
 
 def get_days_order(first_days: int, days):
@@ -91,6 +96,7 @@ FREQUENCY_CHOICES = (
 REPEAT_CHOICES = (
     ("count", _("By count")),
     ("until", _("Until date")),
+    ("forever", _("Without end")),
 )
 
 ISO_WEEKDAYS_MAP = (
@@ -289,8 +295,12 @@ class MultipleOccurrenceForm(forms.Form):
         widget=forms.Select(choices=WEEKDAY_LONG), required=False
     )
 
-    def __init__(self, *args, **kwargs):
+    def __init__(self, *args, group=None, replace=None, **kwargs):
         super().__init__(*args, **kwargs)
+        self.group = group
+        # the event whose following occurrences the form is going to replace,
+        # they are not checked for conflicts
+        self.replace = replace
 
         dtstart = self.initial.get("dtstart")
         if dtstart:
@@ -337,17 +347,63 @@ class MultipleOccurrenceForm(forms.Form):
             ):
                 raise ValueError("Until date must be further in future than start date")
 
+            if (
+                self.group is not None
+                and jivetime_settings.CHECK_CONFLICTS
+                and not self._errors
+            ):
+                self._check_conflicts()
+
         return self.cleaned_data
 
-    def save(self, event: Event):
-        if self.cleaned_data["repeats"] == "count" and self.cleaned_data["count"] == 1:
-            params = {}
-        else:
-            params = self._build_rrule_params(self.cleaned_data)
+    def _check_conflicts(self):
+        times = occurrence_times(
+            self.cleaned_data["start_time"],
+            self.cleaned_data["end_time"],
+            **self.get_rrule_params(),
+        )
+        if not times:
+            return
 
-        event.add_occurrences(
-            self.cleaned_data["start_time"], self.cleaned_data["end_time"], **params
+        occurrences = Occurrence.objects.range_occurrences(
+            times[0][0], max(end for _, end in times), self.group
         )
+        if self.replace is not None:
+            from_time = pytz.utc.localize(self.cleaned_data["start_time"])
+            occurrences = (
+                o
+                for o in occurrences
+                if o.event_id != self.replace.pk or o.start_time < from_time
+            )
+        conflicts = utils.conflicting_times(times, occurrences)
+        if conflicts:
+            start, end, other = conflicts[0]
+            raise forms.ValidationError(
+                _(
+                    "%(count)d occurrence(s) conflict, first at %(start)s with %(title)s"
+                ),
+                params={"count": len(conflicts), "start": start, "title": other.title},
+                code="conflict",
+            )
+
+    def get_rrule_params(self):
+        if self.cleaned_data["repeats"] == "count" and self.cleaned_data["count"] == 1:
+            return {}
+
+        return self._build_rrule_params(self.cleaned_data)
+
+    def save(self, event: Event, replace: bool = False):
+        start_time = self.cleaned_data["start_time"]
+        end_time = self.cleaned_data["end_time"]
+        if replace:
+            event.replace_occurrences(
+                pytz.utc.localize(start_time),
+                start_time,
+                end_time,
+                **self.get_rrule_params(),
+            )
+        else:
+            event.add_occurrences(start_time, end_time, **self.get_rrule_params())
 
         return event
 
@@ -357,7 +413,7 @@ class MultipleOccurrenceForm(forms.Form):
 
         if data["repeats"] == "until":
             params["until"] = data["until"]
-        else:
+        elif data["repeats"] == "count":
             params["count"] = data.get("count", 1)
 
         if params["freq"] == rrule.WEEKLY:
@@ -384,16 +440,85 @@ class MultipleOccurrenceForm(forms.Form):
         return params
 
 
+class EventTypeChoiceIterator(ModelChoiceIterator):
+    def __iter__(self):
+        if self.field.empty_label is not None:
+            yield ("", self.field.empty_label)
+
+        for event_type in event_types.all():
+            yield self.choice(event_type)
+
+    def __len__(self):
+        return len(event_types.all()) + (self.field.empty_label is not None)
+
+    def __bool__(self):
+        return self.field.empty_label is not None or bool(event_types.all())
+
+
+class EventTypeChoiceField(forms.ModelChoiceField):
+    """
+    A ``ModelChoiceField`` for ``EventType`` whose choices and lookups are
+    served from the process-local event type registry instead of queries.
+
+    """
+
+    iterator = EventTypeChoiceIterator
+
+    def __init__(self, **kwargs):
+        super().__init__(EventType.objects.all(), **kwargs)
+
+    def to_python(self, value):
+        if value in self.empty_values:
+            return None
+
+        if isinstance(value, EventType):
+            return value
+
+        try:
+            event_type = event_types.get(int(value))
+        except (TypeError, ValueError):
+            event_type = None
+
+        if event_type is None:
+            raise forms.ValidationError(
+                self.error_messages["invalid_choice"],
+                code="invalid_choice",
+                params={"value": value},
+            )
+
+        return event_type
+
+
 class EventForm(forms.ModelForm):
     """
     A simple form for adding and updating Event attributes
     """
 
+    event_type = EventTypeChoiceField(label=_("Event Type"), required=False)
+
     class Meta:
         model = Event
         fields = "__all__"
 
 
+class ShiftOccurrencesForm(forms.Form):
+    """
+    A form for moving all, or all future, occurrences of an event at once
+    """
+
+    delta = forms.DurationField(
+        label=_("Shift by"),
+        help_text=_("[-][DD] [[HH:]MM:]SS, for example 7 00:00:00 for one week"),
+    )
+    future_only = forms.BooleanField(
+        label=_("Only future occurrences"), initial=True, required=False
+    )
+
+    def save(self, event: Event) -> int:
+        from_time = timezone.now() if self.cleaned_data["future_only"] else None
+        return event.shift_occurrences(self.cleaned_data["delta"], from_time)
+
+
 class SingleOccurrenceForm(forms.ModelForm):
     """
     A simple form for adding and updating single Occurrence attributes
@@ -405,3 +530,27 @@ class SingleOccurrenceForm(forms.ModelForm):
     class Meta:
         model = Occurrence
         fields = "__all__"
+
+    def clean(self):
+        cleaned_data = super().clean()
+        start = cleaned_data.get("start_time")
+        end = cleaned_data.get("end_time")
+        # subclasses may let the event be chosen, e.g. to create occurrences
+        event = cleaned_data.get("event")
+        if event is None and self.instance.event_id:
+            event = self.instance.event
+        if start and end and event and jivetime_settings.CHECK_CONFLICTS:
+            occurrences = Occurrence.objects.range_occurrences(
+                start, end, event.group_id, archive=False
+            )
+            if self.instance.pk:
+                occurrences = occurrences.exclude(pk=self.instance.pk)
+            conflicts = utils.conflicting_times([(start, end)], occurrences)
+            if conflicts:
+                raise forms.ValidationError(
+                    _("Occurrence conflicts with %(title)s"),
+                    params={"title": conflicts[0][2].title},
+                    code="conflict",
+                )
+
+        return cleaned_data
@@ -0,0 +1,40 @@
+import pytz
+from django.core.management.base import BaseCommand
+from django.db.models import F
+
+from jivetime.conf import jivetime_settings
+from jivetime.models import Series, materialization_horizon
+from jivetime.routers import group_databases
+
+
+class Command(BaseCommand):
+    help = (
+        "Create the occurrences of open ended series up to the "
+        "materialization horizon."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=jivetime_settings.OCCURRENCE_BATCH_SIZE,
+            help="Number of series loaded per query.",
+        )
+
+    def handle(self, *args, **options):
+        until = materialization_horizon()
+        extended = created = 0
+        for alias in group_databases():
+            pending = (
+                Series.objects.using(alias)
+                .filter(materialized_until__lt=pytz.utc.localize(until))
+                .exclude(until__lte=F("materialized_until"))
+                .select_related("event")
+            )
+            for series in pending.iterator(chunk_size=options["batch_size"]):
+                created += series.extend(until)
+                extended += 1
+
+        self.stdout.write(
+            "Created {} occurrence(s) for {} series.".format(created, extended)
+        )
@@ -0,0 +1,82 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from jivetime.dataset import EVENTS_PER_BATCH, generate
+from jivetime.models import Event, Occurrence
+from jivetime.routers import using_group
+
+
+class Command(BaseCommand):
+    help = (
+        "Create groups of synthetic events with a reproducible mix of "
+        "recurrences, for load tests and benchmarks."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--groups", type=int, default=1, help="Number of groups to create."
+        )
+        parser.add_argument(
+            "--events",
+            type=int,
+            default=100,
+            help="Number of events created per group.",
+        )
+        parser.add_argument(
+            "--occurrences",
+            type=int,
+            help="Create events per group until they add up to this number of "
+            "occurrences, instead of a fixed number of events.",
+        )
+        parser.add_argument(
+            "--seed",
+            type=int,
+            default=0,
+            help="Seed of the random generator; the same seed creates the same "
+            "events.",
+        )
+        parser.add_argument(
+            "--year", type=int, default=2024, help="Year the events start in."
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=EVENTS_PER_BATCH,
+            help="Number of events inserted per transaction.",
+        )
+
+    def handle(self, *args, **options):
+        for name in ("groups", "events", "occurrences", "batch_size"):
+            if options[name] is not None and options[name] < 1:
+                raise CommandError("--{} must be positive.".format(name))
+
+        started = time.monotonic()
+        groups = generate(
+            options["groups"],
+            events=None if options["occurrences"] else options["events"],
+            occurrences=options["occurrences"],
+            seed=options["seed"],
+            year=options["year"],
+            batch_size=options["batch_size"],
+        )
+        elapsed = time.monotonic() - started
+
+        events = occurrences = 0
+        for group in groups:
+            with using_group(group.pk):
+                events += Event.objects.filter(group=group).count()
+                occurrences += Occurrence.objects.filter(event__group=group).count()
+            if options["verbosity"] > 1:
+                self.stdout.write("Created group {}.".format(group.pk))
+
+        self.stdout.write(
+            "Created {} group(s), {} event(s) and {} occurrence(s) in {:.1f}s "
+            "({:.0f} rows/sec).".format(
+                len(groups),
+                events,
+                occurrences,
+                elapsed,
+                (events + occurrences) / elapsed if elapsed else 0,
+            )
+        )
@@ -0,0 +1,73 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from jivetime.conf import jivetime_settings
+from jivetime.routers import shard_for_group
+from jivetime.sharding import copy_group, purge_group
+
+
+class Command(BaseCommand):
+    help = (
+        "Copy the events of a group to another database in batches, or delete "
+        "them from the database the group was moved away from."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("group", type=int, help="Primary key of the group.")
+        parser.add_argument("target", help="Database alias to copy the group to.")
+        parser.add_argument(
+            "--source",
+            help="Database alias the group is read from; defaults to its "
+            "current shard.",
+        )
+        parser.add_argument(
+            "--purge",
+            action="store_true",
+            help="Delete the group from --source instead, once it is routed "
+            "to the target database.",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=jivetime_settings.OCCURRENCE_BATCH_SIZE,
+            help="Number of rows copied or deleted per statement.",
+        )
+        parser.add_argument(
+            "--sleep",
+            type=float,
+            default=0.5,
+            help="Number of seconds to pause between deleted batches.",
+        )
+
+    def handle(self, *args, **options):
+        group = options["group"]
+        target = options["target"]
+        source = options["source"] or shard_for_group(group)
+        for alias in (source, target):
+            if alias not in connections:
+                raise CommandError("Unknown database alias: {}".format(alias))
+        if source == target:
+            raise CommandError("The source and target databases are the same.")
+
+        if options["purge"]:
+            if shard_for_group(group) != target:
+                raise CommandError(
+                    "Group {} is still routed to {}; map it to {} in "
+                    "SHARD_MAP first.".format(group, shard_for_group(group), target)
+                )
+
+            total = sum(
+                purge_group(group, source, options["batch_size"], options["sleep"])
+            )
+            self.stdout.write(
+                "Deleted {} row(s) of group {} from {}.".format(total, group, source)
+            )
+            return
+
+        total = sum(copy_group(group, source, target, options["batch_size"]))
+        self.stdout.write(
+            "Copied {} row(s) of group {} from {} to {}. Map the group to {} in "
+            "SHARD_MAP, then run this command again with --purge --source {}.".format(
+                total, group, source, target, target, source
+            )
+        )
@@ -0,0 +1,90 @@
+import collections
+import io
+import os
+import pstats
+import tracemalloc
+
+from django.core.management.base import BaseCommand, CommandError
+
+from jivetime.conf import jivetime_settings
+from jivetime.profiling import TracemallocProfiler, profiles
+
+
+class Command(BaseCommand):
+    help = (
+        "Summarize the top functions, and the lines allocating the most "
+        "memory, across the profiles written by the profiling middleware."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--directory",
+            help="Directory holding the profiles; defaults to PROFILE_DIR.",
+        )
+        parser.add_argument(
+            "--view", help="Only summarize the profiles of this view name."
+        )
+        parser.add_argument(
+            "--group", type=int, help="Only summarize the profiles of this group."
+        )
+        parser.add_argument(
+            "--sort",
+            choices=["cumulative", "tottime", "calls"],
+            default="cumulative",
+            help="Order of the functions.",
+        )
+        parser.add_argument(
+            "--limit",
+            type=int,
+            default=20,
+            help="Number of functions or lines listed.",
+        )
+
+    def handle(self, *args, **options):
+        directory = options["directory"] or jivetime_settings.PROFILE_DIR
+        if not directory or not os.path.isdir(directory):
+            raise CommandError(
+                "No profile directory; set PROFILE_DIR or pass --directory."
+            )
+
+        durations = collections.defaultdict(list)
+        calls, snapshots = [], []
+        for path, metadata in profiles(directory, options["view"], options["group"]):
+            durations[metadata["view"]].append(metadata["duration_ms"])
+            if path.endswith(TracemallocProfiler.suffix):
+                snapshots.append(path)
+            else:
+                calls.append(path)
+
+        self.stdout.write(
+            "Summarized {} profile(s) from {}.".format(
+                len(calls) + len(snapshots), directory
+            )
+        )
+        for view, values in sorted(durations.items()):
+            self.stdout.write(
+                "{}: {} profile(s), {:.1f} ms average, {:.1f} ms max".format(
+                    view, len(values), sum(values) / len(values), max(values)
+                )
+            )
+
+        if calls:
+            # OutputWrapper ends every write with a newline, pstats writes
+            # partial lines
+            stream = io.StringIO()
+            stats = pstats.Stats(*calls, stream=stream)
+            stats.strip_dirs().sort_stats(options["sort"]).print_stats(options["limit"])
+            self.stdout.write(stream.getvalue(), ending="")
+
+        if snapshots:
+            self.stdout.write("\nTop allocating lines:")
+            sizes = collections.Counter()
+            ignored = (tracemalloc.Filter(False, tracemalloc.__file__),)
+            for path in snapshots:
+                snapshot = tracemalloc.Snapshot.load(path).filter_traces(ignored)
+                for stat in snapshot.statistics("lineno"):
+                    frame = stat.traceback[0]
+                    sizes["{}:{}".format(frame.filename, frame.lineno)] += stat.size
+
+            for line, size in sizes.most_common(options["limit"]):
+                self.stdout.write("{:>10.1f} KiB  {}".format(size / 1024, line))
@@ -0,0 +1,106 @@
+import time
+from datetime import timedelta
+
+import pytz
+from dateutil import parser as date_parser
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from jivetime.conf import jivetime_settings
+from jivetime.retention import expired_occurrences, purge_occurrences
+from jivetime.routers import group_databases, shard_for_group
+
+
+class Command(BaseCommand):
+    help = "Delete or archive occurrences that ended before a cutoff, in small batches."
+
+    def add_arguments(self, parser):
+        cutoff = parser.add_mutually_exclusive_group(required=True)
+        cutoff.add_argument(
+            "--before",
+            help="Delete occurrences ending before this date or time (UTC).",
+        )
+        cutoff.add_argument(
+            "--days",
+            type=int,
+            help="Delete occurrences ending more than this many days ago.",
+        )
+        parser.add_argument(
+            "--group", type=int, help="Only purge the events of this group."
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=jivetime_settings.OCCURRENCE_BATCH_SIZE,
+            help="Number of occurrences deleted per transaction.",
+        )
+        parser.add_argument(
+            "--sleep",
+            type=float,
+            default=0.5,
+            help="Number of seconds to pause between batches.",
+        )
+        parser.add_argument(
+            "--archive",
+            action="store_true",
+            help="Move the occurrences to the archive table instead.",
+        )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Only report how many occurrences would be deleted.",
+        )
+
+    def handle(self, *args, **options):
+        if options["days"] is not None:
+            before = timezone.now() - timedelta(days=options["days"])
+        else:
+            try:
+                before = date_parser.parse(options["before"])
+            except (ValueError, OverflowError) as exc:
+                raise CommandError("Invalid --before value: {}".format(exc))
+
+            if before.tzinfo is None:
+                before = pytz.utc.localize(before)
+
+        if options["group"] is not None:
+            aliases = [shard_for_group(options["group"])]
+        else:
+            aliases = group_databases()
+
+        if options["dry_run"]:
+            count = sum(
+                expired_occurrences(before, options["group"], alias).count()
+                for alias in aliases
+            )
+            self.stdout.write(
+                "{} occurrence(s) ending before {} would be deleted.".format(
+                    count, before.isoformat()
+                )
+            )
+            return
+
+        verb = "Archived" if options["archive"] else "Deleted"
+        started = time.monotonic()
+        total = 0
+        for alias in aliases:
+            for deleted in purge_occurrences(
+                before,
+                options["group"],
+                options["batch_size"],
+                options["sleep"],
+                options["archive"],
+                alias,
+            ):
+                total += deleted
+                if options["verbosity"] > 1:
+                    self.stdout.write(
+                        "{} {} occurrence(s) on {}.".format(verb, deleted, alias)
+                    )
+
+        elapsed = time.monotonic() - started
+        self.stdout.write(
+            "{} {} occurrence(s) in {:.1f}s ({:.0f} rows/sec).".format(
+                verb, total, elapsed, total / elapsed if elapsed else 0
+            )
+        )
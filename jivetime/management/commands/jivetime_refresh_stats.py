@@ -0,0 +1,42 @@
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from jivetime.conf import jivetime_settings
+from jivetime.models import Event
+from jivetime.routers import group_databases
+
+
+class Command(BaseCommand):
+    help = (
+        "Recompute the denormalized next_start, last_end and occurrence_count "
+        "fields of events whose next occurrence has already started."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--all",
+            action="store_true",
+            help="Refresh every event, not only those with a stale next_start.",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=jivetime_settings.OCCURRENCE_BATCH_SIZE,
+            help="Number of events updated per statement.",
+        )
+
+    def handle(self, *args, **options):
+        now = timezone.now()
+        size = options["batch_size"]
+        updated = 0
+        for alias in group_databases():
+            events = Event.objects.using(alias)
+            if not options["all"]:
+                events = events.filter(next_start__lt=now)
+
+            pks = list(events.order_by("pk").values_list("pk", flat=True))
+            for idx in range(0, len(pks), size):
+                batch = Event.objects.using(alias).filter(pk__in=pks[idx : idx + size])
+                updated += batch.refresh_occurrence_stats(now)
+
+        self.stdout.write("Refreshed {} event(s).".format(updated))
@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand
+
+from jivetime.conf import jivetime_settings
+from jivetime.scheduler import ReminderScheduler
+
+
+class Command(BaseCommand):
+    help = "Send reminders ahead of upcoming occurrences."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--once",
+            action="store_true",
+            help="Send the reminders that are due now and exit.",
+        )
+        parser.add_argument(
+            "--poll-interval",
+            type=float,
+            default=jivetime_settings.REMINDER_POLL_INTERVAL,
+            help="Number of seconds between loads of upcoming reminders.",
+        )
+
+    def handle(self, *args, **options):
+        with ReminderScheduler() as scheduler:
+            if options["once"]:
+                scheduler.load()
+                sent = scheduler.run_pending()
+                self.stdout.write("Sent {} reminder(s).".format(sent))
+                return
+
+            try:
+                scheduler.run(options["poll_interval"])
+            except KeyboardInterrupt:
+                pass
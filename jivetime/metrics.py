@@ -0,0 +1,169 @@
+"""
+Counters and histograms describing jivetime's work
+"""
+import bisect
+import contextlib
+import threading
+import time
+
+from django.utils.module_loading import import_string
+
+from .conf import jivetime_settings
+
+# Upper bounds of the histogram buckets, by metric name; histograms not listed
+# measure seconds.
+BUCKETS = {
+    "jivetime_occurrences_per_call": (1, 10, 100, 1000, 10000, 100000),
+    "jivetime_timeslot_table_cells": (10, 100, 1000, 10000, 100000),
+}
+SECONDS_BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 5, 10)
+
+
+class Metrics:
+    """
+    The interface of a metrics backend. Subclasses forward measurements to
+    e.g. StatsD or a Prometheus client; see the ``METRICS_BACKEND`` setting.
+    """
+
+    # Whether ``render`` returns the metrics, so the metrics view can serve
+    # them; backends pushing the metrics elsewhere leave it False.
+    exposed = False
+
+    def increment(self, name: str, value: float = 1, **labels):
+        """
+        Add ``value`` to the counter ``name``.
+        """
+        raise NotImplementedError
+
+    def observe(self, name: str, value: float, **labels):
+        """
+        Record ``value`` in the histogram ``name``.
+        """
+        raise NotImplementedError
+
+    def render(self) -> str:
+        """
+        Return all metrics in the Prometheus text exposition format, or an
+        empty string unless the backend is ``exposed``.
+        """
+        return ""
+
+    @contextlib.contextmanager
+    def timer(self, name: str, **labels):
+        """
+        Record the seconds spent in the block in the histogram ``name``.
+        """
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - started, **labels)
+
+
+def _labels(labels, **extra) -> str:
+    items = sorted(dict(labels, **extra).items())
+    if not items:
+        return ""
+
+    return "{{{}}}".format(
+        ",".join(
+            '{}="{}"'.format(key, str(value).replace("\\", "\\\\").replace('"', '\\"'))
+            for key, value in items
+        )
+    )
+
+
+class InMemoryMetrics(Metrics):
+    """
+    Keep the metrics of the current process in memory. Each process reports
+    its own values, as the Prometheus client does without its multiprocess
+    mode.
+    """
+
+    exposed = True
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.clear()
+
+    def clear(self):
+        with self._lock:
+            self.counters = {}
+            self.histograms = {}
+
+    def increment(self, name: str, value: float = 1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def observe(self, name: str, value: float, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        buckets = BUCKETS.get(name, SECONDS_BUCKETS)
+        with self._lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = [[0] * len(buckets), 0, 0]
+
+            index = bisect.bisect_left(buckets, value)
+            if index < len(buckets):
+                histogram[0][index] += 1
+            histogram[1] += value
+            histogram[2] += 1
+
+    def value(self, name: str, **labels) -> float:
+        """
+        Return the value of a counter, or the number of observations of a
+        histogram.
+        """
+        key = (name, tuple(sorted(labels.items())))
+        if key in self.histograms:
+            return self.histograms[key][2]
+
+        return self.counters.get(key, 0)
+
+    def render(self) -> str:
+        lines = []
+        typed = set()
+        with self._lock:
+            for (name, labels), value in sorted(self.counters.items()):
+                if name not in typed:
+                    lines.append("# TYPE {} counter".format(name))
+                    typed.add(name)
+                lines.append("{}{} {}".format(name, _labels(labels), value))
+
+            for (name, labels), (counts, total, count) in sorted(
+                self.histograms.items()
+            ):
+                if name not in typed:
+                    lines.append("# TYPE {} histogram".format(name))
+                    typed.add(name)
+                cumulative = 0
+                for bound, bucket in zip(BUCKETS.get(name, SECONDS_BUCKETS), counts):
+                    cumulative += bucket
+                    lines.append(
+                        "{}_bucket{} {}".format(
+                            name, _labels(labels, le=bound), cumulative
+                        )
+                    )
+                lines.append(
+                    "{}_bucket{} {}".format(name, _labels(labels, le="+Inf"), count)
+                )
+                lines.append("{}_sum{} {}".format(name, _labels(labels), total))
+                lines.append("{}_count{} {}".format(name, _labels(labels), count))
+
+        return "\n".join(lines) + "\n"
+
+
+_metrics = None
+
+
+def get_metrics() -> Metrics:
+    """
+    Return the process wide instance of the ``METRICS_BACKEND`` class.
+    """
+    global _metrics
+    if _metrics is None:
+        backend = jivetime_settings.METRICS_BACKEND
+        _metrics = (import_string(backend) if isinstance(backend, str) else backend)()
+
+    return _metrics
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.30 on 2026-10-19 02:17
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("jivetime", "0002_series"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="note",
+            index=models.Index(
+                fields=["content_type", "object_id"], name="jivetime_note_object_idx"
+            ),
+        ),
+    ]
@@ -0,0 +1,72 @@
+# Generated by Django 4.2.30 on 2026-10-19 02:23
+
+from django.db import migrations, models
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+
+def refresh_occurrence_stats(apps, schema_editor):
+    Event = apps.get_model("jivetime", "Event")
+    Occurrence = apps.get_model("jivetime", "Occurrence")
+    occurrences = (
+        Occurrence.objects.filter(event=models.OuterRef("pk"))
+        .order_by()
+        .values("event")
+    )
+    Event.objects.update(
+        next_start=models.Subquery(
+            occurrences.filter(start_time__gte=timezone.now())
+            .annotate(value=models.Min("start_time"))
+            .values("value")
+        ),
+        last_end=models.Subquery(
+            occurrences.annotate(value=models.Max("end_time")).values("value")
+        ),
+        occurrence_count=Coalesce(
+            models.Subquery(
+                occurrences.annotate(value=models.Count("id")).values("value")
+            ),
+            0,
+        ),
+    )
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("jivetime", "0003_note_object_index"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="event",
+            name="last_end",
+            field=models.DateTimeField(
+                blank=True, editable=False, null=True, verbose_name="last end"
+            ),
+        ),
+        migrations.AddField(
+            model_name="event",
+            name="next_start",
+            field=models.DateTimeField(
+                blank=True,
+                db_index=True,
+                editable=False,
+                null=True,
+                verbose_name="next start",
+            ),
+        ),
+        migrations.AddField(
+            model_name="event",
+            name="occurrence_count",
+            field=models.PositiveIntegerField(
+                default=0, editable=False, verbose_name="occurrence count"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="event",
+            index=models.Index(
+                fields=["group", "next_start"], name="jivetime_event_next_idx"
+            ),
+        ),
+        migrations.RunPython(refresh_occurrence_stats, migrations.RunPython.noop),
+    ]
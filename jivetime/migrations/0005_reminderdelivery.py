@@ -0,0 +1,78 @@
+# Generated by Django 4.2.30 on 2026-10-19 02:27
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("jivetime", "0004_event_occurrence_stats"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ReminderDelivery",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("lead", models.DurationField(verbose_name="lead time")),
+                (
+                    "status",
+                    models.CharField(
+                        choices=[
+                            ("pending", "pending"),
+                            ("sent", "sent"),
+                            ("failed", "failed"),
+                        ],
+                        default="pending",
+                        max_length=8,
+                        verbose_name="status",
+                    ),
+                ),
+                (
+                    "claim",
+                    models.CharField(
+                        db_index=True,
+                        editable=False,
+                        max_length=32,
+                        verbose_name="claim",
+                    ),
+                ),
+                (
+                    "created",
+                    models.DateTimeField(auto_now_add=True, verbose_name="created"),
+                ),
+                (
+                    "delivered",
+                    models.DateTimeField(
+                        blank=True, null=True, verbose_name="delivered"
+                    ),
+                ),
+                (
+                    "occurrence",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        to="jivetime.occurrence",
+                        verbose_name="occurrence",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "reminder delivery",
+                "verbose_name_plural": "reminder deliveries",
+            },
+        ),
+        migrations.AddConstraint(
+            model_name="reminderdelivery",
+            constraint=models.UniqueConstraint(
+                fields=("occurrence", "lead"), name="jivetime_reminder_unique"
+            ),
+        ),
+    ]
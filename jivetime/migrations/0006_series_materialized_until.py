@@ -0,0 +1,23 @@
+# Generated by Django 4.2.30 on 2026-10-19 02:29
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("jivetime", "0005_reminderdelivery"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="series",
+            name="materialized_until",
+            field=models.DateTimeField(
+                blank=True,
+                db_index=True,
+                editable=False,
+                null=True,
+                verbose_name="materialized until",
+            ),
+        ),
+    ]
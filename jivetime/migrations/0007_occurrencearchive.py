@@ -0,0 +1,50 @@
+# Generated by Django 4.2.30 on 2026-10-19 02:32
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("jivetime", "0006_series_materialized_until"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="OccurrenceArchive",
+            fields=[
+                ("id", models.BigIntegerField(primary_key=True, serialize=False)),
+                (
+                    "start_time",
+                    models.DateTimeField(db_index=True, verbose_name="start time"),
+                ),
+                (
+                    "end_time",
+                    models.DateTimeField(db_index=True, verbose_name="end time"),
+                ),
+                (
+                    "event",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        to="jivetime.event",
+                        verbose_name="event",
+                    ),
+                ),
+                (
+                    "series",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.SET_NULL,
+                        to="jivetime.series",
+                        verbose_name="series",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "archived occurrence",
+                "verbose_name_plural": "archived occurrences",
+                "ordering": ("start_time", "end_time"),
+            },
+        ),
+    ]
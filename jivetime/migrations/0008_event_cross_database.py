@@ -0,0 +1,36 @@
+# Generated by Django 4.2.30 on 2026-10-19 02:40
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+from jivetime.conf import jivetime_settings
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("jivetime", "0007_occurrencearchive"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="event",
+            name="event_type",
+            field=models.ForeignKey(
+                blank=True,
+                db_constraint=jivetime_settings.EVENT_FOREIGN_KEY_CONSTRAINTS,
+                null=True,
+                on_delete=django.db.models.deletion.CASCADE,
+                to="jivetime.eventtype",
+                verbose_name="Event Type",
+            ),
+        ),
+        migrations.AlterField(
+            model_name="event",
+            name="group",
+            field=models.ForeignKey(
+                db_constraint=jivetime_settings.EVENT_FOREIGN_KEY_CONSTRAINTS,
+                on_delete=django.db.models.deletion.CASCADE,
+                to=jivetime_settings.EVENT_GROUP_MODEL,
+            ),
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 4.2.30 on 2026-10-19 03:09
+
+import datetime
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("jivetime", "0008_event_cross_database"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="series",
+            name="offset",
+            field=models.DurationField(
+                default=datetime.timedelta(0), editable=False, verbose_name="offset"
+            ),
+        ),
+    ]
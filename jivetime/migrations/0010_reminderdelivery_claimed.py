@@ -0,0 +1,22 @@
+# Generated by Django 4.2.30 on 2026-10-19 03:22
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("jivetime", "0009_series_offset"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="reminderdelivery",
+            name="claimed",
+            field=models.DateTimeField(
+                default=django.utils.timezone.now,
+                editable=False,
+                verbose_name="claimed",
+            ),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 4.2.30 on 2026-10-19 03:28
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("jivetime", "0010_reminderdelivery_claimed"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="series",
+            name="until",
+            field=models.DateTimeField(
+                blank=True, editable=False, null=True, verbose_name="until"
+            ),
+        ),
+    ]
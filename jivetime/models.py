@@ -1,17 +1,25 @@
-from datetime import datetime
-from typing import Optional
+import time
+from datetime import datetime, timedelta
+from typing import Optional, Tuple
 
 import pytz
 from dateutil import rrule
 from django.conf import settings
 from django.contrib.contenttypes.fields import GenericForeignKey, GenericRelation
 from django.contrib.contenttypes.models import ContentType
-from django.db import models
+from django.core.exceptions import ValidationError
+from django.db import connections, models, router, transaction
+from django.db.models.functions import Coalesce
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
 from django.urls import reverse
+from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
 from timezone_field import TimeZoneField
 
+from .cache import archive_cutoff, bump_group_version, event_types
 from .conf import jivetime_settings
+from .metrics import get_metrics
 
 
 class Note(models.Model):
@@ -31,11 +39,80 @@ class Note(models.Model):
     class Meta:
         verbose_name = _("note")
         verbose_name_plural = _("notes")
+        indexes = [
+            models.Index(
+                fields=["content_type", "object_id"], name="jivetime_note_object_idx"
+            ),
+        ]
 
     def __str__(self):
         return self.note
 
 
+class NotesQuerySet(models.QuerySet):
+    """
+    Queryset helpers for models with a ``notes`` generic relation.
+    """
+
+    def with_notes(self):
+        """
+        Prefetch the notes of all rows with a single query keyed on
+        ``(content_type, object_id)``.
+        """
+        return self.prefetch_related("notes")
+
+    def with_note_count(self):
+        """
+        Annotate each row with a ``note_count`` computed by a correlated
+        subquery on ``(content_type, object_id)``.
+        """
+        notes = (
+            Note.objects.filter(
+                content_type=ContentType.objects.get_for_model(self.model),
+                object_id=models.OuterRef("pk"),
+            )
+            .order_by()
+            .values("object_id")
+            .annotate(count=models.Count("pk"))
+            .values("count")
+        )
+        return self.annotate(
+            note_count=Coalesce(
+                models.Subquery(notes, output_field=models.IntegerField()), 0
+            )
+        )
+
+
+class EventQuerySet(NotesQuerySet):
+    def refresh_occurrence_stats(self, now: Optional[datetime] = None) -> int:
+        """
+        Recompute the denormalized ``next_start``, ``last_end`` and
+        ``occurrence_count`` fields of every event in the queryset with a single
+        ``UPDATE`` statement. Returns the number of events updated.
+        """
+        occurrences = (
+            Occurrence.objects.filter(event=models.OuterRef("pk"))
+            .order_by()
+            .values("event")
+        )
+        return self.update(
+            next_start=models.Subquery(
+                occurrences.filter(start_time__gte=now or timezone.now())
+                .annotate(value=models.Min("start_time"))
+                .values("value")
+            ),
+            last_end=models.Subquery(
+                occurrences.annotate(value=models.Max("end_time")).values("value")
+            ),
+            occurrence_count=Coalesce(
+                models.Subquery(
+                    occurrences.annotate(value=models.Count("id")).values("value")
+                ),
+                0,
+            ),
+        )
+
+
 class EventType(models.Model):
     """
     Simple ``Event`` classification.
@@ -57,8 +134,13 @@ class Event(models.Model):
     Container model for general metadata and associated ``Occurrence`` entries.
     """
 
+    # groups and event types stay on the default database when events are
+    # sharded, see jivetime.routers.GroupShardRouter and the
+    # EVENT_FOREIGN_KEY_CONSTRAINTS setting
     group = models.ForeignKey(
-        jivetime_settings.EVENT_GROUP_MODEL, on_delete=models.CASCADE
+        jivetime_settings.EVENT_GROUP_MODEL,
+        on_delete=models.CASCADE,
+        db_constraint=jivetime_settings.EVENT_FOREIGN_KEY_CONSTRAINTS,
     )
     title = models.CharField(_("Title"), max_length=32)
     description = models.CharField(_("Description"), max_length=100, blank=True)
@@ -69,18 +151,33 @@ class Event(models.Model):
         on_delete=models.CASCADE,
         null=True,
         blank=True,
+        db_constraint=jivetime_settings.EVENT_FOREIGN_KEY_CONSTRAINTS,
+    )
+    next_start = models.DateTimeField(
+        _("next start"), null=True, blank=True, editable=False, db_index=True
+    )
+    last_end = models.DateTimeField(
+        _("last end"), null=True, blank=True, editable=False
+    )
+    occurrence_count = models.PositiveIntegerField(
+        _("occurrence count"), default=0, editable=False
     )
     notes = GenericRelation(Note, verbose_name=_("notes"))
 
+    objects = EventQuerySet.as_manager()
+
     class Meta:
         verbose_name = _("event")
         verbose_name_plural = _("events")
+        indexes = [
+            models.Index(fields=["group", "next_start"], name="jivetime_event_next_idx")
+        ]
 
     def __str__(self):
         return self.title
 
     def get_absolute_url(self):
-        assert self.group
+        assert self.group_id
         return reverse("jivetime:event-detail", args=[self.group_id, str(self.id)])
 
     def add_occurrences(self, start_time: datetime, end_time: datetime, **rrule_params):
@@ -97,48 +194,340 @@ class Event(models.Model):
 
         If both ``count`` and ``until`` entries are missing from ``rrule_params``,
         only a single ``Occurrence`` instance will be created using the exact
-        ``start_time`` and ``end_time`` values.
-        """
-        count = rrule_params.get("count")
-        until = rrule_params.get("until")
-        if not (count or until):
-            start_time = pytz.utc.localize(start_time)
-            end_time = pytz.utc.localize(end_time)
-            self.occurrence_set.create(start_time=start_time, end_time=end_time)
-        else:
-            rrule_params.setdefault("freq", rrule.DAILY)
-            delta = end_time - start_time
-            occurrences = []
-            for ev in rrule.rrule(dtstart=start_time, **rrule_params):
-                ev = ev.replace(tzinfo=pytz.UTC)
-                occurrences.append(
-                    Occurrence(start_time=ev, end_time=ev + delta, event=self)
-                )
-            self.occurrence_set.bulk_create(occurrences)
+        ``start_time`` and ``end_time`` values, unless a ``freq`` is given. Such
+        open ended recurrences are only created up to the
+        ``MATERIALIZE_HORIZON``; see ``Series.extend``.
+
+        Occurrences generated from a recurrence rule are linked to a new
+        ``Series`` instance recording that rule.
+        """
+        series = None
+        rule = build_rrule(start_time, **rrule_params)
+        if rule is not None:
+            series = self.series_set.create(
+                rule=str(rule),
+                duration=end_time - start_time,
+                materialized_until=Series.horizon_for(start_time, **rrule_params),
+            )
+
+        metrics = get_metrics()
+        with metrics.timer("jivetime_rrule_expansion_seconds"):
+            times = occurrence_times(start_time, end_time, **rrule_params)
+        metrics.increment(
+            "jivetime_occurrences_created_total", len(times), group=self.group_id
+        )
+        metrics.observe("jivetime_occurrences_per_call", len(times))
+        self.occurrence_set.bulk_create(
+            [
+                Occurrence(start_time=st, end_time=et, event=self, series=series)
+                for st, et in times
+            ],
+            batch_size=jivetime_settings.OCCURRENCE_BATCH_SIZE,
+        )
+        self.occurrences_changed()
+
+    def _future_occurrences(
+        self, from_time: Optional[datetime] = None, series: Optional["Series"] = None
+    ):
+        qs = self.occurrence_set.all()
+        if series is not None:
+            qs = qs.filter(series=series)
+        if from_time is not None:
+            qs = qs.filter(start_time__gte=from_time)
+
+        return qs
+
+    def shift_conflicts(
+        self,
+        delta: timedelta,
+        from_time: Optional[datetime] = None,
+        series: Optional["Series"] = None,
+    ) -> list:
+        """
+        Return ``(start_time, end_time, occurrence)`` triples for every
+        occurrence that would overlap another occurrence of the event group if
+        shifted by ``delta``. See ``shift_occurrences``.
+        """
+        from .utils import conflicting_times
+
+        qs = self._future_occurrences(from_time, series)
+        times = [
+            (st + delta, et + delta)
+            for st, et in qs.order_by("start_time").values_list(
+                "start_time", "end_time"
+            )
+        ]
+        if not times:
+            return []
+
+        manager = Occurrence.objects.db_manager(self._state.db)
+        others = manager.range_occurrences(
+            times[0][0],
+            max(et for _, et in times),
+            self.group_id,
+            archive=False,
+        ).exclude(pk__in=qs.values("pk"))
+        return conflicting_times(times, others)
+
+    def shift_occurrences(
+        self,
+        delta: timedelta,
+        from_time: Optional[datetime] = None,
+        check_conflicts: bool = True,
+        series: Optional["Series"] = None,
+    ) -> int:
+        """
+        Move all occurrences, or only those starting on or after ``from_time``,
+        by ``delta`` using a single ``UPDATE`` statement. If ``series`` is
+        given, only its occurrences are moved.
+
+        If ``check_conflicts`` is true and any moved occurrence would overlap
+        another occurrence of the event group, raise ``ValidationError`` and
+        leave all occurrences untouched.
+
+        Returns the number of occurrences moved.
+        """
+        with transaction.atomic(using=self._state.db):
+            if check_conflicts:
+                conflicts = self.shift_conflicts(delta, from_time, series)
+                if conflicts:
+                    raise ValidationError(
+                        _("%(count)d occurrence(s) would conflict with %(title)s"),
+                        params={
+                            "count": len(conflicts),
+                            "title": conflicts[0][2].title,
+                        },
+                        code="conflict",
+                    )
+
+            # occurrences materialized later must follow the moved ones
+            moved = self._future_occurrences(from_time, series)
+            Series.objects.using(self._state.db).filter(
+                pk__in=moved.exclude(series=None).values("series")
+            ).update(
+                offset=models.F("offset") + delta,
+                materialized_until=models.F("materialized_until") + delta,
+                until=models.F("until") + delta,
+            )
+            count = moved.update(
+                start_time=models.F("start_time") + delta,
+                end_time=models.F("end_time") + delta,
+            )
+
+        self.occurrences_changed()
+        return count
+
+    def _delete_occurrences(
+        self, from_time: Optional[datetime], series: Optional["Series"] = None
+    ) -> int:
+        # the deleted occurrences must not be materialized again, those before
+        # them still are
+        ended = self.series_set.filter(materialized_until__isnull=False)
+        if series is not None:
+            ended = ended.filter(pk=series.pk)
+        cutoff = models.F("materialized_until") if from_time is None else from_time
+        ended.filter(models.Q(until=None) | models.Q(until__gt=cutoff)).update(
+            until=cutoff
+        )
+
+        deleted = self._future_occurrences(from_time, series).delete()[1]
+        return deleted.get(Occurrence._meta.label, 0)
+
+    def truncate_occurrences(
+        self, from_time: Optional[datetime], series: Optional["Series"] = None
+    ) -> int:
+        """
+        Delete this and all following occurrences, i.e. every occurrence
+        starting on or after ``from_time``, with a single filtered delete. If
+        ``series`` is given, only its occurrences are deleted.
+
+        Returns the number of occurrences deleted.
+        """
+        with transaction.atomic(using=self._state.db):
+            deleted = self._delete_occurrences(from_time, series)
+
+        self.occurrences_changed()
+        return deleted
+
+    def replace_occurrences(
+        self,
+        from_time: datetime,
+        start_time: datetime,
+        end_time: datetime,
+        series: Optional["Series"] = None,
+        **rrule_params,
+    ) -> int:
+        """
+        Delete every occurrence starting on or after ``from_time`` and create
+        new ones from ``start_time``, ``end_time`` and ``rrule_params`` as in
+        ``add_occurrences``, all inside one transaction. If ``series`` is
+        given, only its occurrences are replaced.
+
+        Returns the number of occurrences deleted.
+        """
+        with transaction.atomic(using=self._state.db):
+            deleted = self._delete_occurrences(from_time, series)
+            self.add_occurrences(start_time, end_time, **rrule_params)
+
+        return deleted
+
+    def occurrences_changed(self):
+        """
+        Refresh the occurrence statistics and invalidate anything else derived
+        from this event's occurrences. Write paths that bypass model signals
+        (bulk inserts, updates and deletes) must call this explicitly.
+        """
+        self.refresh_occurrence_stats()
+        bump_group_version(self.group_id)
+
+    def refresh_occurrence_stats(self, now: Optional[datetime] = None):
+        """
+        Recompute ``next_start``, ``last_end`` and ``occurrence_count`` with one
+        aggregate query and store them without going through ``save``.
+
+        ``next_start`` goes stale as time passes; see the
+        ``jivetime_refresh_stats`` management command.
+        """
+        now = now or timezone.now()
+        stats = self.occurrence_set.order_by().aggregate(
+            next_start=models.Min("start_time", filter=models.Q(start_time__gte=now)),
+            last_end=models.Max("end_time"),
+            occurrence_count=models.Count("id"),
+        )
+        Event.objects.using(self._state.db).filter(pk=self.pk).update(**stats)
+        for name, value in stats.items():
+            setattr(self, name, value)
 
     def upcoming_occurrences(self):
         """
         Return all occurrences that are set to start on or after the current
         time.
         """
-        return self.occurrence_set.filter(start_time__gte=datetime.now())
+        return self.occurrence_set.filter(start_time__gte=timezone.now())
 
     def next_occurrence(self):
         """
         Return the single occurrence set to start on or after the current time
         if available, otherwise ``None``.
         """
-        upcoming = self.upcoming_occurrences()
-        return upcoming[0] if upcoming else None
+        return self.upcoming_occurrences().first()
 
     def daily_occurrences(self, dt=None):
         """
         Convenience method wrapping ``Occurrence.objects.daily_occurrences``.
         """
-        return Occurrence.objects.daily_occurrences(dt=dt, event=self)
+        return Occurrence.objects.db_manager(self._state.db).daily_occurrences(
+            dt=dt, event=self
+        )
+
+
+class Series(models.Model):
+    """
+    The recurrence rule that generated a set of ``Occurrence`` entries of an
+    ``Event``.
+    """
+
+    event = models.ForeignKey(Event, verbose_name=_("event"), on_delete=models.CASCADE)
+    rule = models.TextField(_("recurrence rule"))
+    duration = models.DurationField(_("duration"))
+    created = models.DateTimeField(_("created"), auto_now_add=True)
+    materialized_until = models.DateTimeField(
+        _("materialized until"), null=True, blank=True, editable=False, db_index=True
+    )
+    # how far the occurrences have been shifted away from the times of rule
+    offset = models.DurationField(_("offset"), default=timedelta(0), editable=False)
+    # occurrences of an open ended series truncated at this time are not
+    # created again from it on
+    until = models.DateTimeField(_("until"), null=True, blank=True, editable=False)
+
+    class Meta:
+        verbose_name = _("series")
+        verbose_name_plural = _("series")
+
+    def __str__(self):
+        return "{}: {}".format(self.event.title, self.rule.replace("\n", " "))
+
+    def rrule(self):
+        """
+        Return the ``dateutil.rrule.rrule`` instance described by ``rule``.
+        """
+        return rrule.rrulestr(self.rule)
+
+    @staticmethod
+    def horizon_for(start_time: datetime, **rrule_params) -> Optional[datetime]:
+        """
+        Return the initial ``materialized_until`` value of a series created
+        from ``rrule_params``, or ``None`` unless the recurrence is open ended.
+        """
+        if not is_open_ended(**rrule_params):
+            return None
 
+        return pytz.utc.localize(max(start_time, materialization_horizon()))
 
-class OccurrenceManager(models.Manager):
+    def extend(self, until: Optional[datetime] = None) -> int:
+        """
+        Create the occurrences of an open ended series falling after
+        ``materialized_until`` and up to the naive UTC time ``until``, which
+        defaults to the current materialization horizon, but before the time
+        the series was truncated at.
+
+        Returns the number of occurrences created.
+        """
+        until = until or materialization_horizon()
+        if self.materialized_until is None:
+            return 0
+
+        after = self.materialized_until.astimezone(pytz.utc).replace(tzinfo=None)
+        if until <= after:
+            return 0
+
+        times = [
+            (st + self.offset, et + self.offset)
+            for st, et in rule_times(
+                self.rrule(),
+                self.duration,
+                after=after - self.offset,
+                until=until - self.offset,
+            )
+            if self.until is None or st + self.offset < self.until
+        ]
+        get_metrics().increment(
+            "jivetime_occurrences_created_total", len(times), group=self.event.group_id
+        )
+        with transaction.atomic(using=self._state.db):
+            Occurrence.objects.using(self._state.db).bulk_create(
+                [
+                    Occurrence(
+                        event_id=self.event_id, series=self, start_time=st, end_time=et
+                    )
+                    for st, et in times
+                ],
+                batch_size=jivetime_settings.OCCURRENCE_BATCH_SIZE,
+            )
+            self.materialized_until = pytz.utc.localize(until)
+            Series.objects.using(self._state.db).filter(pk=self.pk).update(
+                materialized_until=self.materialized_until
+            )
+
+        self.event.occurrences_changed()
+        return len(times)
+
+    def shift_occurrences(
+        self, delta: timedelta, from_time: Optional[datetime] = None
+    ) -> int:
+        """
+        Convenience method wrapping ``Event.shift_occurrences``.
+        """
+        return self.event.shift_occurrences(delta, from_time, series=self)
+
+    def truncate_occurrences(self, from_time: Optional[datetime] = None) -> int:
+        """
+        Convenience method wrapping ``Event.truncate_occurrences``.
+        """
+        return self.event.truncate_occurrences(from_time, series=self)
+
+
+class OccurrenceManager(models.Manager.from_queryset(NotesQuerySet)):
     def daily_occurrences(
         self, dt: Optional[datetime] = None, event: Optional[Event] = None
     ):
@@ -168,6 +557,68 @@ class OccurrenceManager(models.Manager):
 
         return qs.filter(event=event) if event else qs
 
+    def range_occurrences(
+        self, start: datetime, end: datetime, group=None, archive: bool = True
+    ):
+        """
+        Returns a queryset of instances that overlap the half-open range
+        ``[start, end)``, ordered by ``start_time``, with their events.
+
+        * ``group`` can be an event group instance or primary key for further
+          filtering.
+        * ``archive`` - if true and the range begins before the archive
+          cutoff, archived occurrences are included too, as ``Occurrence``
+          instances with a true ``archived`` attribute. The result is then a
+          ``union`` queryset, which only supports ordering, slicing and
+          ``values``/``values_list``.
+        """
+        lookups = {"start_time__lt": end, "end_time__gt": start}
+        if group is not None:
+            lookups["event__group"] = group
+
+        qs = self.filter(**lookups).select_related("event")
+        cutoff = archive_cutoff() if archive else None
+        if cutoff is not None and start < cutoff:
+            archived = OccurrenceArchive.objects.filter(**lookups)
+            qs = (
+                qs.annotate(archived=models.Value(False))
+                .order_by()
+                .union(
+                    archived.select_related("event")
+                    .annotate(archived=models.Value(True))
+                    .order_by(),
+                    all=True,
+                )
+            )
+
+        return qs.order_by("start_time", "end_time", "id")
+
+    def upcoming(self, group=None, now: Optional[datetime] = None):
+        """
+        Returns a queryset of instances starting on or after ``now``, ordered
+        by ``start_time`` and ``id``, loading only the columns needed to list
+        or link them.
+
+        * ``group`` can be an event group instance or primary key for further
+          filtering.
+        * ``now`` defaults to the current, timezone aware, time.
+        """
+        qs = self.filter(start_time__gte=now or timezone.now())
+        if group is not None:
+            qs = qs.filter(event__group=group)
+
+        return (
+            qs.select_related("event")
+            .only(
+                "start_time",
+                "end_time",
+                "event__title",
+                "event__group",
+                "event__event_type",
+            )
+            .order_by("start_time", "id")
+        )
+
 
 class Occurrence(models.Model):
     """
@@ -184,6 +635,15 @@ class Occurrence(models.Model):
         on_delete=models.CASCADE,
         db_index=True,
     )
+    series = models.ForeignKey(
+        Series,
+        verbose_name=_("series"),
+        editable=False,
+        null=True,
+        blank=True,
+        on_delete=models.SET_NULL,
+        db_index=True,
+    )
     notes = GenericRelation(Note, verbose_name=_("notes"))
 
     objects = OccurrenceManager()
@@ -198,11 +658,24 @@ class Occurrence(models.Model):
         return "{}: {}".format(self.title, self.start_time.isoformat())
 
     def get_absolute_url(self):
+        # archived occurrences read back by range_occurrences have no page
+        if getattr(self, "archived", False):
+            return self.event.get_absolute_url()
+
         return reverse(
             "jivetime:event-occurrence",
             args=[self.event.group_id, self.event.id, self.id],
         )
 
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        self.event.occurrences_changed()
+
+    def delete(self, *args, **kwargs):
+        result = super().delete(*args, **kwargs)
+        self.event.occurrences_changed()
+        return result
+
     def __lt__(self, other):
         return self.start_time < other.start_time
 
@@ -212,7 +685,78 @@ class Occurrence(models.Model):
 
     @property
     def event_type(self):
-        return self.event.event_type
+        return event_types.get(self.event.event_type_id)
+
+
+class OccurrenceArchive(models.Model):
+    """
+    An ``Occurrence`` moved out of the live table once it lies before the
+    retention cutoff. Rows keep their original primary key and column order,
+    so they can be read back together with live occurrences; see
+    ``OccurrenceManager.range_occurrences``.
+    """
+
+    id = models.BigIntegerField(primary_key=True)
+    start_time = models.DateTimeField(_("start time"), db_index=True)
+    end_time = models.DateTimeField(_("end time"), db_index=True)
+    event = models.ForeignKey(Event, verbose_name=_("event"), on_delete=models.CASCADE)
+    series = models.ForeignKey(
+        Series,
+        verbose_name=_("series"),
+        null=True,
+        blank=True,
+        on_delete=models.SET_NULL,
+    )
+    notes = GenericRelation(Note, verbose_name=_("notes"))
+
+    class Meta:
+        verbose_name = _("archived occurrence")
+        verbose_name_plural = _("archived occurrences")
+        ordering = ("start_time", "end_time")
+
+    def __str__(self):
+        return "{}: {}".format(self.event.title, self.start_time.isoformat())
+
+
+class ReminderDelivery(models.Model):
+    """
+    The delivery state of the reminder sent ``lead`` before an ``Occurrence``.
+    A row is claimed before the reminder is sent, so each reminder is
+    delivered at most once, unless it stays pending past the claim timeout.
+    """
+
+    PENDING = "pending"
+    SENT = "sent"
+    FAILED = "failed"
+    STATUS_CHOICES = (
+        (PENDING, _("pending")),
+        (SENT, _("sent")),
+        (FAILED, _("failed")),
+    )
+
+    occurrence = models.ForeignKey(
+        Occurrence, verbose_name=_("occurrence"), on_delete=models.CASCADE
+    )
+    lead = models.DurationField(_("lead time"))
+    status = models.CharField(
+        _("status"), max_length=8, choices=STATUS_CHOICES, default=PENDING
+    )
+    claim = models.CharField(_("claim"), max_length=32, editable=False, db_index=True)
+    claimed = models.DateTimeField(_("claimed"), default=timezone.now, editable=False)
+    created = models.DateTimeField(_("created"), auto_now_add=True)
+    delivered = models.DateTimeField(_("delivered"), null=True, blank=True)
+
+    class Meta:
+        verbose_name = _("reminder delivery")
+        verbose_name_plural = _("reminder deliveries")
+        constraints = [
+            models.UniqueConstraint(
+                fields=["occurrence", "lead"], name="jivetime_reminder_unique"
+            )
+        ]
+
+    def __str__(self):
+        return "{} ({})".format(self.occurrence, self.lead)
 
 
 class EventGroup(models.Model):
@@ -221,6 +765,102 @@ class EventGroup(models.Model):
     timezone = TimeZoneField()
 
 
+@receiver(post_save, sender=Event)
+@receiver(post_delete, sender=Event)
+def _event_changed(sender, instance, **kwargs):
+    bump_group_version(instance.group_id)
+
+
+@receiver(post_save, sender=EventType)
+@receiver(post_delete, sender=EventType)
+def _event_type_changed(sender, instance, **kwargs):
+    event_types.invalidate()
+
+
+def is_open_ended(**rrule_params) -> bool:
+    """
+    Return whether ``rrule_params`` describe a recurrence without an end, i.e.
+    a ``freq`` but neither ``count`` nor ``until``.
+    """
+    return rrule_params.get("freq") is not None and not (
+        rrule_params.get("count") or rrule_params.get("until")
+    )
+
+
+def materialization_horizon(now: Optional[datetime] = None) -> datetime:
+    """
+    Return the naive UTC time up to which occurrences of open ended
+    recurrences are created.
+    """
+    now = now or timezone.now()
+    return now.replace(tzinfo=None) + jivetime_settings.MATERIALIZE_HORIZON
+
+
+def build_rrule(start_time: datetime, **rrule_params) -> Optional[rrule.rrule]:
+    """
+    Return the ``dateutil.rrule.rrule`` described by ``rrule_params``, or
+    ``None`` if neither ``count``, ``until`` nor ``freq`` is given. See
+    ``Event.add_occurrences``.
+    """
+    count = rrule_params.get("count")
+    until = rrule_params.get("until")
+    if not (count or until or is_open_ended(**rrule_params)):
+        return None
+
+    rrule_params.setdefault("freq", rrule.DAILY)
+    return rrule.rrule(dtstart=start_time, **rrule_params)
+
+
+def rule_times(rule: rrule.rrule, delta: timedelta, after=None, until=None):
+    """
+    Return a list of ``(start_time, end_time)`` UTC pairs, ``delta`` apart, for
+    the naive start times of ``rule`` after ``after`` and up to ``until``.
+    """
+    if until is not None:
+        starts = rule.between(after or datetime.min, until, inc=True)
+    else:
+        starts = list(rule)
+
+    times = []
+    for ev in starts:
+        if after is not None and ev <= after:
+            continue
+
+        ev = ev.replace(tzinfo=pytz.UTC)
+        times.append((ev, ev + delta))
+
+    return times
+
+
+def occurrence_times(start_time: datetime, end_time: datetime, **rrule_params):
+    """
+    Return a list of ``(start_time, end_time)`` UTC pairs following the same
+    rules as ``Event.add_occurrences``, without touching the database.
+    """
+    rule = build_rrule(start_time, **rrule_params)
+    if rule is None:
+        return [(pytz.utc.localize(start_time), pytz.utc.localize(end_time))]
+
+    until = None
+    if is_open_ended(**rrule_params):
+        until = max(start_time, materialization_horizon())
+
+    return rule_times(rule, end_time - start_time, until=until)
+
+
+def occurrence_stats(times, now: Optional[datetime] = None) -> dict:
+    """
+    Return the ``Event`` occurrence statistics fields for a list of
+    ``(start_time, end_time)`` pairs, as produced by ``occurrence_times``.
+    """
+    now = now or timezone.now()
+    return {
+        "next_start": min((st for st, et in times if st >= now), default=None),
+        "last_end": max((et for st, et in times), default=None),
+        "occurrence_count": len(times),
+    }
+
+
 def create_event(
     title,
     event_type,
@@ -257,16 +897,22 @@ def create_event(
     """
 
     if isinstance(event_type, tuple):
-        event_type, created = EventType.objects.get_or_create(
-            abbr=event_type[0], label=event_type[1]
-        )
+        cached = event_types.get_by_abbr(event_type[0])
+        if cached is not None and cached.label == event_type[1]:
+            event_type = cached
+        else:
+            event_type, created = EventType.objects.get_or_create(
+                abbr=event_type[0], label=event_type[1]
+            )
 
-    event = Event.objects.create(
+    # saved through the instance, so database routers can place it by group
+    event = Event(
         title=title,
         description=description,
         event_type=event_type,
         group=group,
     )
+    event.save()
 
     if note is not None:
         event.notes.create(note=note)
@@ -276,3 +922,173 @@ def create_event(
     end_time = end_time or (start_time + jivetime_settings.DEFAULT_OCCURRENCE_DURATION)
     event.add_occurrences(start_time, end_time, **rrule_params)
     return event
+
+
+def _insert_returning_pks(model, objs: list, using: str, batch_size: int):
+    if connections[using].features.can_return_rows_from_bulk_insert:
+        model.objects.using(using).bulk_create(objs, batch_size=batch_size)
+    else:
+        for obj in objs:
+            obj.save(using=using)
+
+
+_EVENT_FIELDS = ("title", "event_type", "group", "description", "note")
+
+
+def create_events_bulk(specs) -> Tuple[list, dict]:
+    """
+    Create many events, including their event types, notes and occurrences,
+    inside a single transaction.
+
+    Each item of ``specs`` is a ``dict`` of ``create_event`` keyword arguments.
+    Event types given as ``(abbreviation, label)`` tuples are resolved with a
+    single query; events, notes, series and occurrences are each inserted with
+    batched ``bulk_create`` statements.
+
+    Returns a 2-tuple of the list of new ``Event`` instances, in ``specs``
+    order, and a ``dict`` of per-phase timings in seconds.
+
+    The events of groups routed to different databases are created with one
+    transaction per database.
+    """
+    specs = list(specs)
+    databases = {}
+    for index, spec in enumerate(specs):
+        db = router.db_for_write(Event, instance=Event(group=spec["group"]))
+        databases.setdefault(db, []).append(index)
+
+    if len(databases) > 1:
+        events = [None] * len(specs)
+        timings = {}
+        for indexes in databases.values():
+            created, part = create_events_bulk([specs[i] for i in indexes])
+            for index, event in zip(indexes, created):
+                events[index] = event
+            for phase, seconds in part.items():
+                timings[phase] = timings.get(phase, 0) + seconds
+
+        return events, timings
+
+    batch_size = jivetime_settings.OCCURRENCE_BATCH_SIZE
+    db = next(iter(databases), None) or router.db_for_write(Event)
+    timings = {}
+    with transaction.atomic(using=db):
+        started = time.perf_counter()
+        labels = {}
+        for spec in specs:
+            if isinstance(spec["event_type"], tuple):
+                abbr, label = spec["event_type"]
+                labels.setdefault(abbr, label)
+
+        resolved = {}
+        for abbr in labels:
+            event_type = event_types.get_by_abbr(abbr)
+            if event_type is not None:
+                resolved[abbr] = event_type
+
+        unresolved = [abbr for abbr in labels if abbr not in resolved]
+        if unresolved:
+            resolved.update(EventType.objects.in_bulk(unresolved, field_name="abbr"))
+            missing = [
+                EventType(abbr=abbr, label=labels[abbr])
+                for abbr in unresolved
+                if abbr not in resolved
+            ]
+            if missing:
+                for event_type in EventType.objects.bulk_create(missing):
+                    resolved[event_type.abbr] = event_type
+
+                event_types.invalidate()
+
+        timings["event_types"] = time.perf_counter() - started
+
+        started = time.perf_counter()
+        now = timezone.now()
+        default_start = datetime.now().replace(minute=0, second=0, microsecond=0)
+        expanded = []
+        for spec in specs:
+            rrule_params = {
+                key: value for key, value in spec.items() if key not in _EVENT_FIELDS
+            }
+            start_time = rrule_params.pop("start_time", None) or default_start
+            end_time = rrule_params.pop("end_time", None) or (
+                start_time + jivetime_settings.DEFAULT_OCCURRENCE_DURATION
+            )
+            expanded.append(
+                (
+                    build_rrule(start_time, **rrule_params),
+                    end_time - start_time,
+                    Series.horizon_for(start_time, **rrule_params),
+                    occurrence_times(start_time, end_time, **rrule_params),
+                )
+            )
+
+        timings["expansion"] = time.perf_counter() - started
+        metrics = get_metrics()
+        metrics.observe("jivetime_rrule_expansion_seconds", timings["expansion"])
+
+        started = time.perf_counter()
+        events = []
+        for spec, (rule, duration, horizon, times) in zip(specs, expanded):
+            event_type = spec["event_type"]
+            if isinstance(event_type, tuple):
+                event_type = resolved[event_type[0]]
+
+            events.append(
+                Event(
+                    title=spec["title"],
+                    description=spec.get("description", ""),
+                    event_type=event_type,
+                    group=spec["group"],
+                    **occurrence_stats(times, now),
+                )
+            )
+
+        _insert_returning_pks(Event, events, db, batch_size)
+        for event, (rule, duration, horizon, times) in zip(events, expanded):
+            metrics.increment(
+                "jivetime_occurrences_created_total", len(times), group=event.group_id
+            )
+            metrics.observe("jivetime_occurrences_per_call", len(times))
+        timings["events"] = time.perf_counter() - started
+
+        started = time.perf_counter()
+        content_type = ContentType.objects.get_for_model(Event)
+        notes = []
+        for event, spec in zip(events, specs):
+            note = spec.get("note")
+            if note is not None:
+                notes.append(
+                    Note(content_type=content_type, object_id=event.pk, note=note)
+                )
+
+        Note.objects.using(db).bulk_create(notes, batch_size=batch_size)
+        timings["notes"] = time.perf_counter() - started
+
+        started = time.perf_counter()
+        series = []
+        occurrences = []
+        for event, (rule, duration, horizon, times) in zip(events, expanded):
+            item = None
+            if rule is not None:
+                item = Series(
+                    event=event,
+                    rule=str(rule),
+                    duration=duration,
+                    materialized_until=horizon,
+                )
+                series.append(item)
+
+            occurrences.extend(
+                Occurrence(event=event, series=item, start_time=st, end_time=et)
+                for st, et in times
+            )
+
+        _insert_returning_pks(Series, series, db, batch_size)
+        Occurrence.objects.using(db).bulk_create(occurrences, batch_size=batch_size)
+        timings["occurrences"] = time.perf_counter() - started
+
+    for group_id in {event.group_id for event in events}:
+        bump_group_version(group_id)
+
+    return events, timings
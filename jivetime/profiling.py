@@ -0,0 +1,212 @@
+"""
+Sampling profiler for jivetime views
+"""
+import cProfile
+import functools
+import itertools
+import json
+import logging
+import os
+import random
+import threading
+import time
+import tracemalloc
+from typing import Iterator, Optional, Tuple
+
+from django.urls import Resolver404, resolve
+from django.utils import timezone
+
+from .conf import jivetime_settings
+from .metrics import get_metrics
+
+logger = logging.getLogger(__name__)
+
+# Calendar scope of the views showing a day, month or year.
+SCOPES = {
+    "calendar-day": "day",
+    "calendar-today": "day",
+    "calendar-month": "month",
+    "calendar-year": "year",
+}
+
+# one profiled request at a time per process: cProfile and tracemalloc hooks
+# are process wide on recent Pythons, and concurrent profiles would mix
+_lock = threading.Lock()
+_counter = itertools.count(1)
+
+
+class CProfiler:
+    """
+    Collect the calls and time of each function with ``cProfile``; the dumps
+    are ``pstats`` files.
+    """
+
+    suffix = ".prof"
+
+    def __init__(self):
+        self.profile = cProfile.Profile()
+
+    def start(self):
+        # raises ValueError if another profiler is active
+        self.profile.enable()
+
+    def stop(self):
+        self.profile.disable()
+
+    def dump(self, path: str):
+        self.profile.dump_stats(path)
+
+
+class TracemallocProfiler:
+    """
+    Collect the memory allocated by each line with ``tracemalloc``; the dumps
+    are ``tracemalloc.Snapshot`` files.
+    """
+
+    suffix = ".snapshot"
+
+    def start(self):
+        if tracemalloc.is_tracing():
+            raise ValueError("tracemalloc is already tracing")
+        tracemalloc.start()
+
+    def stop(self):
+        self.snapshot = tracemalloc.take_snapshot()
+        tracemalloc.stop()
+
+    def dump(self, path: str):
+        self.snapshot.dump(path)
+
+
+PROFILERS = {"cprofile": CProfiler, "tracemalloc": TracemallocProfiler}
+
+
+def _dump(profiler, directory: str, match, request, response, seconds, reason):
+    os.makedirs(directory, exist_ok=True)
+    name = "{:%Y%m%dT%H%M%S}-{}-{}".format(timezone.now(), os.getpid(), next(_counter))
+    path = os.path.join(directory, name)
+    profiler.dump(path + profiler.suffix)
+    group = match.kwargs.get("gid", match.args[0] if match.args else None)
+    metadata = {
+        "profile": name + profiler.suffix,
+        "profiler": jivetime_settings.PROFILER,
+        "reason": reason,
+        "view": match.view_name,
+        "scope": SCOPES.get(match.url_name),
+        "group": None if group is None else int(group),
+        "method": request.method,
+        "path": request.path,
+        "status": response.status_code,
+        "duration_ms": round(seconds * 1000, 1),
+        "created": timezone.now().isoformat(),
+    }
+    with open(path + ".json", "w") as fp:
+        json.dump(metadata, fp)
+
+    get_metrics().increment(
+        "jivetime_profiles_total", profiler=metadata["profiler"], reason=reason
+    )
+    logger.info("Wrote profile %s of %s", path + profiler.suffix, match.view_name)
+
+
+def _profile(request, get_response, match=None):
+    directory = jivetime_settings.PROFILE_DIR
+    if not directory:
+        return get_response(request)
+
+    if match is None:
+        try:
+            match = resolve(request.path_info)
+        except Resolver404:
+            return get_response(request)
+
+    if "jivetime" not in match.namespaces:
+        return get_response(request)
+
+    # a latency threshold profiles every request, keeping the slow ones
+    threshold = jivetime_settings.PROFILE_THRESHOLD
+    sampled = random.random() < jivetime_settings.PROFILE_SAMPLE_RATE
+    if not (sampled or threshold is not None) or not _lock.acquire(blocking=False):
+        return get_response(request)
+
+    try:
+        profiler = PROFILERS[jivetime_settings.PROFILER]()
+        try:
+            profiler.start()
+        except ValueError:
+            return get_response(request)
+
+        started = time.perf_counter()
+        try:
+            response = get_response(request)
+        finally:
+            profiler.stop()
+        seconds = time.perf_counter() - started
+    finally:
+        _lock.release()
+
+    if sampled or seconds >= threshold:
+        reason = "sampled" if sampled else "slow"
+        try:
+            _dump(profiler, directory, match, request, response, seconds, reason)
+        except OSError:
+            logger.exception("Failed to write a profile to %s", directory)
+
+    return response
+
+
+class ProfilingMiddleware:
+    """
+    Profile a sample of the requests to jivetime views, and every request
+    slower than a threshold, with ``cProfile`` or ``tracemalloc``. Each
+    profile is written to the ``PROFILE_DIR`` directory next to a JSON file
+    with the view, calendar scope, group and duration of the request; see the
+    ``jivetime_profile_summary`` command. Does nothing unless ``PROFILE_DIR``
+    is set.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        return _profile(request, self.get_response)
+
+
+def profiled(view):
+    """
+    Profile a single view like ``ProfilingMiddleware`` does.
+    """
+
+    @functools.wraps(view)
+    def wrapper(request, *args, **kwargs):
+        return _profile(
+            request,
+            lambda request: view(request, *args, **kwargs),
+            request.resolver_match,
+        )
+
+    return wrapper
+
+
+def profiles(
+    directory: str, view: Optional[str] = None, group: Optional[int] = None
+) -> Iterator[Tuple[str, dict]]:
+    """
+    Yield the path and metadata of each profile written to ``directory``,
+    optionally only those of ``view`` or ``group``.
+    """
+    for name in sorted(os.listdir(directory)):
+        if not name.endswith(".json"):
+            continue
+
+        with open(os.path.join(directory, name)) as fp:
+            metadata = json.load(fp)
+        path = os.path.join(directory, metadata["profile"])
+        if not os.path.exists(path):
+            continue
+        if view is not None and metadata["view"] != view:
+            continue
+        if group is not None and metadata["group"] != group:
+            continue
+
+        yield path, metadata
@@ -0,0 +1,119 @@
+"""
+Retention helpers for historical occurrences
+"""
+import time
+from datetime import datetime
+from typing import Iterator, Optional
+
+from django.contrib.contenttypes.models import ContentType
+from django.db import transaction
+
+from .cache import bump_group_version, refresh_archive_cutoff
+from .conf import jivetime_settings
+from .models import Event, Note, Occurrence, OccurrenceArchive
+
+
+def expired_occurrences(before: datetime, group=None, using: Optional[str] = None):
+    """
+    Return a queryset of the occurrences ending before ``before``.
+
+    * ``group`` can be an event group instance or primary key for further
+      filtering.
+    * ``using`` is the database alias to read from; see
+      ``jivetime.routers.group_databases``.
+    """
+    qs = Occurrence.objects.using(using).filter(end_time__lt=before)
+    if group is not None:
+        qs = qs.filter(event__group=group)
+
+    return qs
+
+
+def _archive(batch: list, using: Optional[str]):
+    OccurrenceArchive.objects.using(using).bulk_create(
+        [
+            OccurrenceArchive(
+                id=pk,
+                event_id=event_id,
+                series_id=series_id,
+                start_time=start_time,
+                end_time=end_time,
+            )
+            for pk, event_id, group_id, series_id, start_time, end_time in batch
+        ]
+    )
+    # keep the notes of archived occurrences from being deleted with them
+    content_types = ContentType.objects.get_for_models(Occurrence, OccurrenceArchive)
+    Note.objects.using(using).filter(
+        content_type=content_types[Occurrence],
+        object_id__in=[row[0] for row in batch],
+    ).update(content_type=content_types[OccurrenceArchive])
+
+
+def purge_occurrences(
+    before: datetime,
+    group=None,
+    batch_size: Optional[int] = None,
+    pause: float = 0,
+    archive: bool = False,
+    using: Optional[str] = None,
+) -> Iterator[int]:
+    """
+    Delete the occurrences ending before ``before`` in batches of at most
+    ``batch_size`` rows, walking the primary key so no batch rescans rows that
+    are already gone. Each batch runs in its own short transaction and is
+    followed by a ``pause`` of that many seconds, leaving room for other
+    writers and for replicas to catch up.
+
+    Notes and other dependent rows are deleted in bulk with their batch, and
+    the statistics of the affected events are refreshed. If ``archive`` is
+    true, the occurrences and their notes are moved to ``OccurrenceArchive``
+    instead, and the archive cutoff is refreshed once all batches are done. An
+    occurrence whose primary key is already archived raises ``IntegrityError``
+    and rolls its batch back, keeping it live.
+
+    Only the database ``using`` is purged, the default one unless a router
+    picks another; see ``jivetime.routers.group_databases``.
+
+    Yields the number of occurrences deleted by each batch.
+    """
+    batch_size = batch_size or jivetime_settings.OCCURRENCE_BATCH_SIZE
+    expired = expired_occurrences(before, group, using).order_by("pk")
+    last = 0
+    while True:
+        with transaction.atomic(using=using):
+            batch = list(
+                expired.filter(pk__gt=last).values_list(
+                    "pk",
+                    "event_id",
+                    "event__group_id",
+                    "series_id",
+                    "start_time",
+                    "end_time",
+                )[:batch_size]
+            )
+            if not batch:
+                break
+
+            last = batch[-1][0]
+            if archive:
+                _archive(batch, using)
+
+            deleted = (
+                Occurrence.objects.using(using)
+                .filter(pk__in=[row[0] for row in batch])
+                .delete()
+            )
+            Event.objects.using(using).filter(
+                pk__in={row[1] for row in batch}
+            ).refresh_occurrence_stats()
+
+        for group_id in {row[2] for row in batch}:
+            bump_group_version(group_id)
+
+        yield deleted[1].get(Occurrence._meta.label, 0)
+        if pause:
+            time.sleep(pause)
+
+    if archive:
+        refresh_archive_cutoff()
@@ -0,0 +1,231 @@
+"""
+Database routing for sending calendar reads to a replica
+"""
+import contextlib
+import contextvars
+import functools
+import zlib
+from typing import List
+
+from django.db import DEFAULT_DB_ALIAS
+
+from .conf import jivetime_settings
+
+# Name of the cookie keeping a client on the primary database after a write.
+PRIMARY_COOKIE = "jivetime_primary"
+
+_read_alias = contextvars.ContextVar("jivetime_read_alias", default=None)
+_group_alias = contextvars.ContextVar("jivetime_group_alias", default=None)
+
+# Models whose rows are placed on the database of their event group.
+SHARDED_MODELS = {
+    "jivetime.event",
+    "jivetime.series",
+    "jivetime.occurrence",
+    "jivetime.occurrencearchive",
+    "jivetime.reminderdelivery",
+    "jivetime.note",
+}
+
+
+class ReplicaRouter:
+    """
+    Route the reads of views decorated with ``use_replica`` to the
+    ``REPLICA_DATABASE`` alias. Every other read, and all writes, are left to
+    the default database.
+
+    Add ``"jivetime.routers.ReplicaRouter"`` to ``DATABASE_ROUTERS`` to enable
+    it.
+    """
+
+    def db_for_read(self, model, **hints):
+        return _read_alias.get()
+
+    def db_for_write(self, model, **hints):
+        return None
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # the replica holds a copy of the primary
+        aliases = {DEFAULT_DB_ALIAS, jivetime_settings.REPLICA_DATABASE}
+        if obj1._state.db in aliases and obj2._state.db in aliases:
+            return True
+
+        return None
+
+
+def use_replica(view):
+    """
+    Serve the reads of a read-only ``view`` from the ``REPLICA_DATABASE``
+    alias, unless the client wrote through a ``pin_primary`` view within the
+    last ``READ_YOUR_WRITES_SECONDS`` and so might not see its own changes on
+    the replica yet.
+    """
+
+    @functools.wraps(view)
+    def wrapper(request, *args, **kwargs):
+        alias = jivetime_settings.REPLICA_DATABASE
+        if not alias or PRIMARY_COOKIE in request.COOKIES:
+            return view(request, *args, **kwargs)
+
+        token = _read_alias.set(alias)
+        try:
+            return view(request, *args, **kwargs)
+        finally:
+            _read_alias.reset(token)
+
+    return wrapper
+
+
+def pin_primary(view):
+    """
+    Keep a client on the primary database for ``READ_YOUR_WRITES_SECONDS``
+    after any unsafe request to ``view``, so the redirect following a write
+    and the calendar views shown next reflect it.
+    """
+
+    @functools.wraps(view)
+    def wrapper(request, *args, **kwargs):
+        response = view(request, *args, **kwargs)
+        if jivetime_settings.REPLICA_DATABASE and request.method not in (
+            "GET",
+            "HEAD",
+            "OPTIONS",
+            "TRACE",
+        ):
+            response.set_cookie(
+                PRIMARY_COOKIE,
+                "1",
+                max_age=jivetime_settings.READ_YOUR_WRITES_SECONDS,
+                httponly=True,
+                samesite="Lax",
+            )
+
+        return response
+
+    return wrapper
+
+
+def shard_for_group(group) -> str:
+    """
+    Return the database alias holding the events of ``group``, an event
+    group instance or primary key: its ``SHARD_MAP`` entry if there is one,
+    otherwise one of ``SHARDS`` picked by a stable hash of the primary key.
+    """
+    key = getattr(group, "pk", group)
+    alias = jivetime_settings.SHARD_MAP.get(key)
+    if alias is not None:
+        return alias
+
+    shards = jivetime_settings.SHARDS
+    if not shards:
+        return DEFAULT_DB_ALIAS
+
+    return shards[zlib.crc32(str(key).encode()) % len(shards)]
+
+
+def group_databases() -> List[str]:
+    """
+    Return the aliases of every database that may hold events: the default
+    database, ``SHARDS`` and the aliases of ``SHARD_MAP``. Commands working on
+    all groups at once run on each of them in turn.
+    """
+    aliases = set(jivetime_settings.SHARDS or ())
+    aliases.update(jivetime_settings.SHARD_MAP.values())
+    aliases.add(DEFAULT_DB_ALIAS)
+    return sorted(aliases)
+
+
+@contextlib.contextmanager
+def using_group(group):
+    """
+    Route the queries made inside the block that carry no instance to go by,
+    such as ``Occurrence.objects.range_occurrences``, to the database of
+    ``group``.
+    """
+    token = _group_alias.set(shard_for_group(group))
+    try:
+        yield
+    finally:
+        _group_alias.reset(token)
+
+
+def use_group_shard(view):
+    """
+    Run a ``view`` taking a ``gid`` argument inside ``using_group``.
+    """
+
+    @functools.wraps(view)
+    def wrapper(request, gid, *args, **kwargs):
+        with using_group(int(gid)):
+            return view(request, gid, *args, **kwargs)
+
+    return wrapper
+
+
+class GroupShardRouter:
+    """
+    Place events, their occurrences, series, notes and reminders on the
+    database of their event group; see ``shard_for_group``. Event groups,
+    event types and everything else stay on the default database.
+
+    Queries on a model instance, its related managers included, follow the
+    instance. Other queries go to the database selected with ``using_group``
+    and otherwise to the default database. Deleting an event group does not
+    cascade to another database; move or delete its events first.
+
+    Add ``"jivetime.routers.GroupShardRouter"`` to ``DATABASE_ROUTERS`` to
+    enable it, after migrating with ``EVENT_FOREIGN_KEY_CONSTRAINTS`` set to
+    ``False``, and see the ``jivetime_move_group`` command for moving a group
+    to another database.
+    """
+
+    def _sharded(self, model) -> bool:
+        return model._meta.label_lower in SHARDED_MODELS
+
+    def _instance_db(self, instance):
+        if instance._meta.label_lower == jivetime_settings.EVENT_GROUP_MODEL.lower():
+            return shard_for_group(instance.pk)
+
+        if not self._sharded(type(instance)):
+            return None
+
+        if instance._meta.label_lower == "jivetime.event":
+            return shard_for_group(instance.group_id)
+
+        if instance._state.db:
+            return instance._state.db
+
+        # new rows follow the related event or series they were created with
+        for field in instance._meta.concrete_fields:
+            if field.is_relation and field.is_cached(instance):
+                related = field.get_cached_value(instance)
+                if related is not None and self._sharded(type(related)):
+                    return self._instance_db(related)
+
+        return None
+
+    def _db(self, model, hints):
+        instance = hints.get("instance")
+        if not self._sharded(model):
+            # Django would otherwise look up the event group or event type of
+            # a sharded row on the database of that row
+            if instance is not None and self._sharded(type(instance)):
+                return DEFAULT_DB_ALIAS
+
+            return None
+
+        alias = self._instance_db(instance) if instance is not None else None
+        return alias or _group_alias.get()
+
+    def db_for_read(self, model, **hints):
+        return self._db(model, hints)
+
+    def db_for_write(self, model, **hints):
+        return self._db(model, hints)
+
+    def allow_relation(self, obj1, obj2, **hints):
+        if self._sharded(type(obj1)) and self._sharded(type(obj2)):
+            return obj1._state.db == obj2._state.db
+
+        # event groups and event types are referenced from every database
+        return True
@@ -0,0 +1,247 @@
+"""
+Reminder scheduling for upcoming occurrences
+"""
+import heapq
+import logging
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import Optional
+
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .conf import jivetime_settings
+from .models import Occurrence, ReminderDelivery
+from .routers import group_databases
+
+logger = logging.getLogger(__name__)
+
+
+def log_reminder(occurrence: Occurrence, lead: timedelta):
+    """
+    Default reminder backend, logging reminders instead of delivering them.
+    """
+    logger.info("Reminder: %s starts in %s", occurrence, lead)
+
+
+class ReminderScheduler:
+    """
+    Send a reminder ``lead`` before the start of every occurrence, for each of
+    ``leads``, through the ``backend`` callable.
+
+    Reminders falling due within ``horizon`` are loaded with a window query on
+    ``start_time`` per database holding events, and kept in a heap ordered by
+    due time. Due reminders are claimed in the database in batches, so each is
+    sent at most once even with several schedulers running, and delivered
+    concurrently by a pool of ``workers`` threads. Failed reminders, and those
+    still pending ``claim_timeout`` after they were claimed, are retried.
+    """
+
+    def __init__(
+        self,
+        backend=None,
+        leads=None,
+        horizon: Optional[timedelta] = None,
+        workers: Optional[int] = None,
+        batch_size: Optional[int] = None,
+        claim_timeout: Optional[timedelta] = None,
+    ):
+        backend = backend or jivetime_settings.REMINDER_BACKEND
+        self.backend = import_string(backend) if isinstance(backend, str) else backend
+        self.leads = tuple(leads or jivetime_settings.REMINDER_LEADS)
+        self.horizon = horizon or jivetime_settings.REMINDER_HORIZON
+        self.batch_size = batch_size or jivetime_settings.OCCURRENCE_BATCH_SIZE
+        self.claim_timeout = claim_timeout or jivetime_settings.REMINDER_CLAIM_TIMEOUT
+        self._executor = ThreadPoolExecutor(
+            workers or jivetime_settings.REMINDER_WORKERS,
+            thread_name_prefix="jivetime-reminders",
+        )
+        self._heap = []
+        self._queued = set()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __len__(self):
+        return len(self._heap)
+
+    def close(self):
+        self._executor.shutdown()
+
+    def next_due(self) -> Optional[datetime]:
+        """
+        Return the due time of the earliest queued reminder, or ``None``.
+        """
+        return self._heap[0][0] if self._heap else None
+
+    def load(self, now: Optional[datetime] = None) -> int:
+        """
+        Queue the undelivered reminders of occurrences that have not started
+        yet and fall due by ``now`` plus ``horizon``. Reminders that are
+        already overdue are queued too, so none are lost while no scheduler is
+        running.
+
+        Returns the number of newly queued reminders.
+        """
+        now = now or timezone.now()
+        until = now + self.horizon
+        window = {
+            "start_time__gt": now,
+            "start_time__lte": until + max(self.leads),
+        }
+        queued = 0
+        for alias in group_databases():
+            # retryable reminders are queued again, until their occurrence
+            # starts
+            delivered = set(
+                ReminderDelivery.objects.using(alias)
+                .filter(
+                    **{"occurrence__" + key: value for key, value in window.items()}
+                )
+                .exclude(self._retryable())
+                .values_list("occurrence_id", "lead")
+            )
+            occurrences = Occurrence.objects.using(alias).filter(**window)
+            for pk, start_time in occurrences.values_list("id", "start_time"):
+                for lead in self.leads:
+                    due = start_time - lead
+                    key = (alias, pk, lead)
+                    if due > until or key[1:] in delivered or key in self._queued:
+                        continue
+
+                    heapq.heappush(self._heap, (due,) + key)
+                    self._queued.add(key)
+                    queued += 1
+
+        return queued
+
+    def run_pending(self, now: Optional[datetime] = None) -> int:
+        """
+        Deliver every queued reminder due by ``now``, in batches of at most
+        ``batch_size``. Returns the number of reminders delivered.
+        """
+        now = now or timezone.now()
+        sent = 0
+        while self._heap and self._heap[0][0] <= now:
+            batches = {}
+            for _ in range(self.batch_size):
+                if not self._heap or self._heap[0][0] > now:
+                    break
+
+                due, alias, pk, lead = heapq.heappop(self._heap)
+                self._queued.discard((alias, pk, lead))
+                batches.setdefault(alias, []).append((pk, lead))
+
+            for alias, batch in batches.items():
+                sent += self._deliver(alias, batch, now)
+
+        return sent
+
+    def run(self, poll_interval: Optional[float] = None, stop=None):
+        """
+        Reload and deliver reminders every ``poll_interval`` seconds, waking up
+        early for reminders falling due in between, until the
+        ``threading.Event`` ``stop`` is set.
+        """
+        poll_interval = poll_interval or jivetime_settings.REMINDER_POLL_INTERVAL
+        stop = stop or threading.Event()
+        next_load = time.monotonic()
+        while not stop.is_set():
+            if time.monotonic() >= next_load:
+                self.load()
+                next_load = time.monotonic() + poll_interval
+
+            self.run_pending()
+            wait = next_load - time.monotonic()
+            due = self.next_due()
+            if due is not None:
+                wait = min(wait, (due - timezone.now()).total_seconds())
+
+            stop.wait(max(wait, 0))
+
+    def _retryable(self) -> Q:
+        # failed reminders, and pending ones whose scheduler likely died while
+        # sending them
+        return Q(status=ReminderDelivery.FAILED) | Q(
+            status=ReminderDelivery.PENDING,
+            claimed__lt=timezone.now() - self.claim_timeout,
+        )
+
+    def _claim(self, alias: str, batch: list) -> list:
+        # rows already claimed elsewhere are skipped by the unique constraint,
+        # retryable rows are claimed again by whoever updates them first; the
+        # claim token then tells which of the rows are ours
+        claim = uuid.uuid4().hex
+        claimed = timezone.now()
+        ReminderDelivery.objects.using(alias).bulk_create(
+            [
+                ReminderDelivery(
+                    occurrence_id=pk, lead=lead, claim=claim, claimed=claimed
+                )
+                for pk, lead in batch
+            ],
+            ignore_conflicts=True,
+        )
+        by_lead = {}
+        for pk, lead in batch:
+            by_lead.setdefault(lead, []).append(pk)
+        for lead, pks in by_lead.items():
+            ReminderDelivery.objects.using(alias).filter(
+                self._retryable(), occurrence_id__in=pks, lead=lead
+            ).update(claim=claim, claimed=claimed, status=ReminderDelivery.PENDING)
+
+        return list(ReminderDelivery.objects.using(alias).filter(claim=claim))
+
+    def _send(self, occurrence: Occurrence, lead: timedelta) -> bool:
+        try:
+            self.backend(occurrence, lead)
+        except Exception:
+            logger.exception("Reminder for %s failed", occurrence)
+            return False
+
+        return True
+
+    def _deliver(self, alias: str, batch: list, now: datetime) -> int:
+        occurrences = (
+            Occurrence.objects.using(alias)
+            .select_related("event")
+            .in_bulk({pk for pk, lead in batch})
+        )
+        due = []
+        for pk, lead in batch:
+            if pk not in occurrences:
+                continue
+
+            # the occurrence may have moved since it was loaded
+            start_time = occurrences[pk].start_time
+            if start_time - lead > now:
+                heapq.heappush(self._heap, (start_time - lead, alias, pk, lead))
+                self._queued.add((alias, pk, lead))
+            else:
+                due.append((pk, lead))
+
+        claimed = self._claim(alias, due)
+        results = self._executor.map(
+            self._send,
+            [occurrences[delivery.occurrence_id] for delivery in claimed],
+            [delivery.lead for delivery in claimed],
+        )
+
+        sent, failed = [], []
+        for delivery, ok in zip(claimed, results):
+            (sent if ok else failed).append(delivery.pk)
+
+        ReminderDelivery.objects.using(alias).filter(pk__in=sent).update(
+            status=ReminderDelivery.SENT, delivered=timezone.now()
+        )
+        ReminderDelivery.objects.using(alias).filter(pk__in=failed).update(
+            status=ReminderDelivery.FAILED
+        )
+        return len(sent)
@@ -0,0 +1,185 @@
+"""
+Helpers for moving event groups between databases
+"""
+import time
+from typing import Iterator, Optional
+
+from django.contrib.contenttypes.models import ContentType
+from django.db import transaction
+
+from .cache import bump_group_version
+from .conf import jivetime_settings
+from .models import (
+    Event,
+    Note,
+    Occurrence,
+    OccurrenceArchive,
+    ReminderDelivery,
+    Series,
+    _insert_returning_pks,
+)
+
+
+def _batches(qs, batch_size: int):
+    # walk the primary key so every batch is a cheap range scan
+    qs = qs.order_by("pk")
+    last = None
+    while True:
+        page = qs if last is None else qs.filter(pk__gt=last)
+        batch = list(page[:batch_size])
+        if not batch:
+            return
+
+        last = batch[-1].pk
+        yield batch
+
+
+def _group_rows(group_id, using: str) -> list:
+    # dependent rows come after the rows they reference
+    return [
+        Event.objects.using(using).filter(group=group_id),
+        Series.objects.using(using).filter(event__group=group_id),
+        Occurrence.objects.using(using).filter(event__group=group_id),
+        OccurrenceArchive.objects.using(using).filter(event__group=group_id),
+        ReminderDelivery.objects.using(using).filter(occurrence__event__group=group_id),
+    ]
+
+
+def _copy_notes(model, ids: dict, source: str, target: str, batch_size: int) -> int:
+    content_type = ContentType.objects.get_for_model(model)
+    old_ids = list(ids)
+    copied = 0
+    for offset in range(0, len(old_ids), batch_size):
+        notes = list(
+            Note.objects.using(source).filter(
+                content_type=content_type,
+                object_id__in=old_ids[offset : offset + batch_size],
+            )
+        )
+        for note in notes:
+            note.pk = None
+            note.object_id = ids[note.object_id]
+
+        Note.objects.using(target).bulk_create(notes)
+        copied += len(notes)
+
+    return copied
+
+
+def copy_group(
+    group, source: str, target: str, batch_size: Optional[int] = None
+) -> Iterator[int]:
+    """
+    Copy the events of ``group``, an event group instance or primary key,
+    with their series, occurrences, archived occurrences, reminder deliveries
+    and notes from the ``source`` database alias to ``target``, in batches of
+    at most ``batch_size`` rows.
+
+    Rows get new primary keys on ``target``. Archived occurrences take theirs
+    from the occurrence sequence of ``target``, so they can clash neither with
+    its archive nor with occurrences archived there later. The copy runs in one transaction on ``target``, so a
+    failed copy leaves nothing behind. Writes to the group should be paused
+    until the group is routed to ``target``; see ``purge_group``.
+
+    Yields the number of rows copied by each batch.
+    """
+    batch_size = batch_size or jivetime_settings.OCCURRENCE_BATCH_SIZE
+    group_id = getattr(group, "pk", group)
+    events, series, occurrences, archived, reminders = _group_rows(group_id, source)
+    ids = {Event: {}, Series: {}, Occurrence: {}}
+    with transaction.atomic(using=target):
+        for model, qs in ((Event, events), (Series, series), (Occurrence, occurrences)):
+            for batch in _batches(qs, batch_size):
+                old_ids = []
+                for obj in batch:
+                    old_ids.append(obj.pk)
+                    obj.pk = None
+                    obj._state.adding = True
+                    if model is not Event:
+                        obj.event_id = ids[Event][obj.event_id]
+                    if model is Occurrence and obj.series_id is not None:
+                        obj.series_id = ids[Series][obj.series_id]
+
+                _insert_returning_pks(model, batch, target, batch_size)
+                ids[model].update(zip(old_ids, (obj.pk for obj in batch)))
+                yield len(batch)
+
+        archived_ids = {}
+        for batch in _batches(archived, batch_size):
+            for obj in batch:
+                obj.event_id = ids[Event][obj.event_id]
+                if obj.series_id is not None:
+                    obj.series_id = ids[Series][obj.series_id]
+
+            # reserve the primary keys with occurrences deleted right away
+            reserved = [
+                Occurrence(
+                    event_id=obj.event_id,
+                    start_time=obj.start_time,
+                    end_time=obj.end_time,
+                )
+                for obj in batch
+            ]
+            _insert_returning_pks(Occurrence, reserved, target, batch_size)
+            Occurrence.objects.using(target).filter(
+                pk__in=[obj.pk for obj in reserved]
+            ).delete()
+            for obj, occurrence in zip(batch, reserved):
+                archived_ids[obj.pk] = occurrence.pk
+                obj.pk = occurrence.pk
+
+            OccurrenceArchive.objects.using(target).bulk_create(batch)
+            yield len(batch)
+
+        for batch in _batches(reminders, batch_size):
+            for obj in batch:
+                obj.pk = None
+                obj.occurrence_id = ids[Occurrence][obj.occurrence_id]
+
+            ReminderDelivery.objects.using(target).bulk_create(batch)
+            yield len(batch)
+
+        ids[OccurrenceArchive] = archived_ids
+        for model in (Event, Occurrence, OccurrenceArchive):
+            copied = _copy_notes(model, ids[model], source, target, batch_size)
+            if copied:
+                yield copied
+
+    bump_group_version(group_id)
+
+
+def purge_group(
+    group, using: str, batch_size: Optional[int] = None, pause: float = 0
+) -> Iterator[int]:
+    """
+    Delete the events of ``group`` and everything attached to them from the
+    ``using`` database alias, once a copy made by ``copy_group`` serves the
+    group. Each batch of at most ``batch_size`` rows is deleted in its own
+    short transaction, followed by a ``pause`` of that many seconds.
+
+    Yields the number of rows deleted by each batch.
+    """
+    batch_size = batch_size or jivetime_settings.OCCURRENCE_BATCH_SIZE
+    group_id = getattr(group, "pk", group)
+    content_types = ContentType.objects.get_for_models(
+        Event, Occurrence, OccurrenceArchive
+    )
+    for qs in reversed(_group_rows(group_id, using)):
+        while True:
+            with transaction.atomic(using=using):
+                pks = list(qs.order_by("pk").values_list("pk", flat=True)[:batch_size])
+                if not pks:
+                    break
+
+                model = qs.model
+                if model in content_types:
+                    Note.objects.using(using).filter(
+                        content_type=content_types[model], object_id__in=pks
+                    ).delete()
+                deleted = model.objects.using(using).filter(pk__in=pks).delete()
+
+            yield deleted[0]
+            if pause:
+                time.sleep(pause)
+
+    bump_group_version(group_id)
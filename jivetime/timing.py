@@ -0,0 +1,146 @@
+"""
+Server-Timing instrumentation for jivetime views
+"""
+import contextlib
+import contextvars
+import functools
+import logging
+import time
+
+from django import shortcuts
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+_timings = contextvars.ContextVar("jivetime_timings", default=None)
+
+
+class Timings:
+    """
+    The number of runs and total seconds of each named phase of a request.
+    Phases may overlap, e.g. queries run while rendering a template are
+    counted in both ``db`` and ``render``.
+    """
+
+    def __init__(self):
+        self.phases = {}
+
+    def add(self, name: str, seconds: float):
+        phase = self.phases.setdefault(name, [0, 0.0])
+        phase[0] += 1
+        phase[1] += seconds
+
+    def count(self, name: str) -> int:
+        return self.phases.get(name, (0, 0.0))[0]
+
+    def milliseconds(self, name: str) -> float:
+        return round(self.phases.get(name, (0, 0.0))[1] * 1000, 1)
+
+    def execute(self, execute, sql, params, many, context):
+        # a database execute wrapper, see connection.execute_wrapper
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.add("db", time.perf_counter() - started)
+
+    def header(self) -> str:
+        """
+        Return the value of a ``Server-Timing`` response header.
+        """
+        metrics = []
+        for name in self.phases:
+            metric = "{};dur={}".format(name, self.milliseconds(name))
+            if name == "db":
+                metric += ';desc="{} queries"'.format(self.count(name))
+            metrics.append(metric)
+
+        return ", ".join(metrics)
+
+
+@contextlib.contextmanager
+def timed(name: str):
+    """
+    Add the time spent in the block, or in the decorated function, to the
+    ``name`` phase of the request being measured, if any.
+    """
+    timings = _timings.get()
+    if timings is None:
+        yield
+        return
+
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings.add(name, time.perf_counter() - started)
+
+
+def render(request, template_name, context=None, *args, **kwargs):
+    """
+    ``django.shortcuts.render``, timed as the ``render`` phase.
+    """
+    with timed("render"):
+        return shortcuts.render(request, template_name, context, *args, **kwargs)
+
+
+def _measure(request, get_response):
+    timings = Timings()
+    token = _timings.set(timings)
+    started = time.perf_counter()
+    try:
+        with contextlib.ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(timings.execute))
+            response = get_response(request)
+    finally:
+        _timings.reset(token)
+
+    timings.add("total", time.perf_counter() - started)
+    match = request.resolver_match
+    if match is None or "jivetime" not in match.namespaces:
+        return response
+
+    response["Server-Timing"] = timings.header()
+    data = {
+        "view": match.view_name,
+        "group": match.kwargs.get("gid", match.args[0] if match.args else None),
+        "status": response.status_code,
+        "queries": timings.count("db"),
+    }
+    for name in timings.phases:
+        data["{}_ms".format(name)] = timings.milliseconds(name)
+
+    logger.info(
+        " ".join("{}={}".format(key, value) for key, value in data.items()),
+        extra={"jivetime_timing": data},
+    )
+    return response
+
+
+class ServerTimingMiddleware:
+    """
+    Measure the queries, database time, time slot table construction and
+    template rendering of every jivetime view, and report them in a
+    ``Server-Timing`` response header and an ``INFO`` record of the
+    ``jivetime.timing`` logger. The record carries the measurements as a
+    ``jivetime_timing`` dict for structured log handlers.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        return _measure(request, self.get_response)
+
+
+def server_timing(view):
+    """
+    Measure a single view like ``ServerTimingMiddleware`` does.
+    """
+
+    @functools.wraps(view)
+    def wrapper(request, *args, **kwargs):
+        return _measure(request, lambda request: view(request, *args, **kwargs))
+
+    return wrapper
@@ -29,14 +29,40 @@ urlpatterns = [
         views.day_view,
         name="calendar-day",
     ),
+    re_path(
+        r"^calendar/(?P<gid>\d+)/conflicts/$",
+        views.conflicts_view,
+        name="calendar-conflicts",
+    ),
+    re_path(
+        r"^calendar/(?P<gid>\d+)/free-busy/$",
+        views.free_busy_view,
+        name="calendar-free-busy",
+    ),
+    re_path(
+        r"^calendar/(?P<gid>\d+)/agenda/$",
+        views.agenda_view,
+        name="calendar-agenda",
+    ),
+    re_path(
+        r"^calendar/(?P<gid>\d+)/agenda/upcoming/$",
+        views.agenda_api_view,
+        name="calendar-agenda-api",
+    ),
     re_path(r"^events/(?P<gid>\d+)/$", views.event_listing, name="event-list"),
     re_path(
         r"^events/(?P<gid>\d+)/add/$", views.EventAddView.as_view(), name="event-add"
     ),
     re_path(r"^events/(\d+)/detail/(\d+)/$", views.event_view, name="event-detail"),
+    re_path(
+        r"^events/(?P<gid>\d+)/detail/(?P<pk>\d+)/occurrences/$",
+        views.event_occurrences_view,
+        name="event-occurrences",
+    ),
     re_path(
         r"^events/(\d+)/detail/(\d+)/(\d+)/$",
         views.occurrence_view,
         name="event-occurrence",
     ),
+    re_path(r"^metrics/$", views.metrics_view, name="metrics"),
 ]
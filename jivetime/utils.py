@@ -1,14 +1,26 @@
 """
 Common features and functions for jivetime
 """
+import base64
+import binascii
 import calendar
+import heapq
+import itertools
+import json
 from copy import copy
 from datetime import date, datetime, time, timedelta, tzinfo
+from typing import Tuple
 
 import pytz
+from django.db.models import Q
+from django.utils import timezone
 
+from .cache import get_cache, group_version
 from .conf import jivetime_settings
+from .metrics import get_metrics
 from .models import Occurrence
+from .routers import using_group
+from .timing import timed
 
 
 def month_boundaries(dt=None):
@@ -23,8 +35,10 @@ def month_boundaries(dt=None):
     return (start, start + timedelta(ndays - 1))
 
 
+@timed("timeslots")
 def create_timeslot_table(
     dt: datetime,
+    group=None,
     start_time: time = jivetime_settings.TIMESLOT_START_TIME,
     end_time_delta: timedelta = jivetime_settings.TIMESLOT_END_TIME_DURATION,
     time_delta: timedelta = jivetime_settings.TIMESLOT_INTERVAL,
@@ -40,6 +54,8 @@ def create_timeslot_table(
     also match an interval in the sequence of the computed row entries.
 
     * ``dt`` - a ``datetime.datetime`` instance
+    * ``group`` - an event group instance or primary key whose occurrences,
+      archived ones included, are shown; all groups if ``None``
     * ``start_time`` - a ``datetime.time`` instance
     * ``end_time_delta`` - a ``datetime.timedelta`` instance
     * ``time_delta`` - a ``datetime.timedelta`` instance
@@ -52,7 +68,12 @@ def create_timeslot_table(
     dtstart = datetime.combine(dt.date(), start_time, tzinfo=pytz.UTC)
     dtend = dtstart + end_time_delta
 
-    items = Occurrence.objects.daily_occurrences(dt).select_related("event")
+    metrics = get_metrics()
+    day = timezone.make_aware(datetime(dt.year, dt.month, dt.day))
+    with metrics.timer("jivetime_range_query_seconds", scope="day"):
+        items = list(
+            Occurrence.objects.range_occurrences(day, day + timedelta(days=1), group)
+        )
 
     # build a mapping of timeslot "buckets"
     timeslots: dict = {}
@@ -116,4 +137,268 @@ def create_timeslot_table(
             cols[colkey] = timeslots[rowkey][colkey]
 
         table.append((rowkey, cols))
+
+    metrics.observe("jivetime_timeslot_table_cells", len(table) * column_count)
     return table
+
+
+def overlapping_pairs(occurrences) -> list:
+    """
+    Return a list of ``(earlier, later)`` occurrence pairs whose time spans
+    overlap, using a single sort-and-sweep pass.
+
+    ``occurrences`` must be ordered by ``start_time``, as returned by
+    ``Occurrence.objects.range_occurrences``.
+
+    """
+    pairs = []
+    active: list = []
+    for seq, item in enumerate(occurrences):
+        # drop everything that ended before this item started
+        while active and active[0][0] <= item.start_time:
+            heapq.heappop(active)
+
+        for _, _, other in sorted(active, key=lambda entry: entry[1]):
+            pairs.append((other, item))
+
+        heapq.heappush(active, (item.end_time, seq, item))
+
+    return pairs
+
+
+def overlapping_clusters(occurrences) -> list:
+    """
+    Return a list of clusters, each being a list of two or more occurrences
+    that are transitively connected by overlapping time spans.
+
+    ``occurrences`` must be ordered by ``start_time``.
+
+    """
+    clusters = []
+    current: list = []
+    current_end = None
+    for item in occurrences:
+        if current and item.start_time < current_end:
+            current.append(item)
+            current_end = max(current_end, item.end_time)
+            continue
+
+        if len(current) > 1:
+            clusters.append(current)
+
+        current = [item]
+        current_end = item.end_time
+
+    if len(current) > 1:
+        clusters.append(current)
+
+    return clusters
+
+
+def conflicting_times(times, occurrences) -> list:
+    """
+    Compare candidate ``(start_time, end_time)`` pairs against existing
+    occurrences and return ``(start_time, end_time, occurrence)`` triples for
+    each candidate that overlaps an existing occurrence.
+
+    Both ``times`` and ``occurrences`` must be ordered by start time, so that a
+    whole series can be checked against a single range query.
+
+    """
+    conflicts = []
+    active: list = []
+    counter = itertools.count()
+    existing = iter(occurrences)
+    pending = next(existing, None)
+    for start, end in times:
+        while pending is not None and pending.start_time < end:
+            heapq.heappush(active, (pending.end_time, next(counter), pending))
+            pending = next(existing, None)
+
+        while active and active[0][0] <= start:
+            heapq.heappop(active)
+
+        other = next((o for _, _, o in active if o.start_time < end), None)
+        if other is not None:
+            conflicts.append((start, end, other))
+
+    return conflicts
+
+
+def iter_busy(group, start: datetime, end: datetime):
+    """
+    Yield the disjoint ``(start, end)`` busy intervals of a group, clipped to
+    the range ``[start, end)``.
+
+    Occurrences are streamed from a single query ordered by ``start_time`` on
+    the database of the group, and merged in one pass, so memory use is
+    bounded by the merged output.
+
+    """
+    # the rows are read once the generator is consumed, maybe interleaved
+    # with other groups, so pin the database the routers pick for the group
+    with using_group(group):
+        occurrences = Occurrence.objects.range_occurrences(start, end, group)
+        occurrences = occurrences.using(occurrences.db)
+
+    # every ordering column is selected, as union querysets (ranges reaching
+    # into the archive) would add it to the rows anyway
+    rows = occurrences.values_list("start_time", "end_time", "id").iterator()
+    busy_start = busy_end = None
+    for item_start, item_end, pk in rows:
+        item_start = max(item_start, start)
+        item_end = min(item_end, end)
+        if busy_end is not None and item_start <= busy_end:
+            busy_end = max(busy_end, item_end)
+            continue
+
+        if busy_end is not None:
+            yield busy_start, busy_end
+
+        busy_start, busy_end = item_start, item_end
+
+    if busy_end is not None:
+        yield busy_start, busy_end
+
+
+def free_busy(group, start: datetime, end: datetime) -> list:
+    """
+    Return a list of the disjoint ``(start, end)`` busy intervals of a group
+    within ``[start, end)``.
+
+    Results are cached per group version, so any change to the group's
+    occurrences invalidates them.
+
+    """
+    group_id = getattr(group, "pk", group)
+    key = "jivetime:free-busy:{}:{}:{}:{}".format(
+        group_id, group_version(group_id), start.isoformat(), end.isoformat()
+    )
+    cache = get_cache()
+    metrics = get_metrics()
+    busy = cache.get(key)
+    metrics.increment(
+        "jivetime_cache_requests_total",
+        cache="free_busy",
+        result="miss" if busy is None else "hit",
+    )
+    if busy is None:
+        with metrics.timer("jivetime_range_query_seconds", scope="free_busy"):
+            busy = list(iter_busy(group_id, start, end))
+        cache.set(key, busy, jivetime_settings.FREE_BUSY_CACHE_TIMEOUT)
+
+    return busy
+
+
+def find_free_slots(
+    groups,
+    duration: timedelta,
+    window: Tuple[datetime, datetime],
+    limit: int = 10,
+    time_delta: timedelta = jivetime_settings.TIMESLOT_INTERVAL,
+) -> list:
+    """
+    Return up to ``limit`` ``(start, end)`` slots of length ``duration`` that
+    are free in every one of ``groups`` within ``window``.
+
+    Slot starts are aligned to the ``time_delta`` grid, counted from midnight
+    of the first day of the window. The busy intervals of each group are
+    streamed in start order from the database of that group and k-way merged,
+    so the scan stops as soon as ``limit`` slots are found.
+
+    * ``groups`` - an iterable of event group instances or primary keys
+    * ``duration`` - a ``datetime.timedelta`` instance
+    * ``window`` - a 2-tuple of aware ``datetime.datetime`` instances
+    * ``limit`` - the maximum number of slots to return
+    * ``time_delta`` - a ``datetime.timedelta`` instance
+
+    """
+    start, end = window
+    origin = datetime.combine(start.date(), time(0), tzinfo=start.tzinfo)
+
+    def align(dt):
+        return origin - ((origin - dt) // time_delta) * time_delta
+
+    busy = heapq.merge(*[iter_busy(group, start, end) for group in groups])
+    slots: list = []
+    current = align(start)
+    for busy_start, busy_end in itertools.chain(busy, [(end, end)]):
+        while current + duration <= busy_start and len(slots) < limit:
+            slots.append((current, current + duration))
+            current += time_delta
+
+        if len(slots) >= limit:
+            break
+
+        if busy_end > current:
+            current = align(busy_end)
+
+    return slots
+
+
+def encode_cursor(*values) -> str:
+    """
+    Encode JSON serializable ``values`` into an opaque, URL safe pagination
+    cursor.
+
+    """
+    data = json.dumps(values, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(data).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> list:
+    """
+    Decode a cursor created by ``encode_cursor``. Raises ``ValueError`` for
+    malformed cursors.
+
+    """
+    try:
+        data = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        values = json.loads(data)
+    except (TypeError, UnicodeDecodeError, binascii.Error) as exc:
+        raise ValueError("invalid cursor") from exc
+
+    if not isinstance(values, list):
+        raise ValueError("invalid cursor")
+
+    return values
+
+
+def keyset_page(
+    queryset,
+    fields: Tuple[str, ...],
+    after=None,
+    size: int = jivetime_settings.PAGE_SIZE,
+    reverse: bool = False,
+) -> Tuple[list, object]:
+    """
+    Return a 2-tuple of up to ``size`` rows of ``queryset`` ordered by
+    ``fields`` and the key values of the last row, or ``None`` if there are no
+    more rows.
+
+    Rows are fetched with a seek predicate on ``fields`` rather than an
+    offset, so every page costs the same at any depth.
+
+    * ``fields`` - a tuple of field names that uniquely orders the rows
+    * ``after`` - the key values of the last row of the previous page
+    * ``reverse`` - if true, walk the ordering backwards
+
+    """
+    lookup = "lt" if reverse else "gt"
+    if after is not None:
+        seek = Q()
+        for idx, field in enumerate(fields):
+            seek |= Q(
+                **dict(zip(fields[:idx], after[:idx])),
+                **{"{}__{}".format(field, lookup): after[idx]},
+            )
+        queryset = queryset.filter(seek)
+
+    ordering = ["-" + f if reverse else f for f in fields]
+    rows = list(queryset.order_by(*ordering)[: size + 1])
+    if len(rows) <= size:
+        return rows, None
+
+    rows = rows[:size]
+    last = rows[-1]
+    return rows, tuple(getattr(last, field) for field in fields)
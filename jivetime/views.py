@@ -10,17 +10,25 @@ from dateutil import parser
 from django import http
 from django.apps import apps
 from django.contrib import messages
+from django.core.exceptions import ValidationError
 from django.db import models
-from django.shortcuts import get_object_or_404, redirect, render
+from django.shortcuts import get_object_or_404, redirect
+from django.template.loader import render_to_string
 from django.urls import reverse
+from django.utils import timezone
+from django.utils.decorators import method_decorator
 from django.utils.module_loading import import_string
 from django.utils.translation import gettext_lazy as _
 from django.views.generic import CreateView
 
 from . import forms, utils
+from .cache import archive_cutoff
 from .conf import jivetime_settings
 from .forms import WEEKDAY_SHORT
+from .metrics import get_metrics
 from .models import Event, Occurrence
+from .routers import pin_primary, use_group_shard, use_replica
+from .timing import render, timed
 
 if jivetime_settings.CALENDAR_FIRST_WEEKDAY is not None:
     calendar.setfirstweekday(jivetime_settings.CALENDAR_FIRST_WEEKDAY)
@@ -46,26 +54,55 @@ EventFormClass = load_config_form(jivetime_settings.FORM_EVENT)
 ReccurrenceFormClass = load_config_form(jivetime_settings.FORM_RECURRENCE)
 
 
+@use_replica
+@use_group_shard
 def event_listing(
-    request, template="jivetime/event_list.html", events=None, **extra_context
+    request,
+    gid: int,
+    template="jivetime/event_list.html",
+    events=None,
+    **extra_context,
 ):
     """
-    View all ``events``.
+    View the ``events`` of a group, one keyset paginated page at a time ordered
+    by ``(title, id)``. The ``after`` query parameter carries the cursor of the
+    previous page.
 
     If ``events`` is a queryset, clone it. If ``None`` default to all ``Event``s.
 
     Context parameters:
 
     ``events``
-        an iterable of ``Event`` objects
+        a list of ``Event`` objects
+
+    ``next_cursor``
+        the cursor for the following page, or ``None`` on the last page
 
     ... plus all values passed in via **extra_context
     """
-    events = events or Event.objects.all()
-    extra_context["events"] = events
+    group = get_event_group(gid)
+    events = (Event.objects.all() if events is None else events).filter(group=group)
+
+    after = None
+    if "after" in request.GET:
+        try:
+            after = _decode_event_cursor(request.GET["after"])
+        except ValueError:
+            return http.HttpResponseBadRequest("Bad Request")
+
+    page, last = utils.keyset_page(
+        events, ("title", "id"), after=after, size=jivetime_settings.PAGE_SIZE
+    )
+    extra_context.update(
+        group=group,
+        events=page,
+        next_cursor=utils.encode_cursor(*last) if last else None,
+    )
     return render(request, template, extra_context)
 
 
+@pin_primary
+@use_group_shard
 def event_view(
     request,
     gid: int,
@@ -81,6 +118,10 @@ def event_view(
     ``event``
         the event keyed by ``pk``
 
+    ``archived_stats``
+        the ``count``, ``first`` and ``last`` of the event's archived
+        occurrences, or ``None`` if nothing was archived yet
+
     """
 
     event = get_object_or_404(Event, pk=int(pk), group_id=int(gid))
@@ -90,21 +131,40 @@ def event_view(
     )
 
     event_form = EventFormClass(instance=event)
+    shift_form = forms.ShiftOccurrencesForm()
     if request.method == "POST":
         if "_update" in request.POST:
             event_form = EventFormClass(request.POST, instance=event)
             if event_form.is_valid():
                 event_form.save(event)
                 return http.HttpResponseRedirect(request.path)
-        elif "_add" in request.POST:
-            recurrence_form = ReccurrenceFormClass(request.POST)
+        elif "_add" in request.POST or "_replace" in request.POST:
+            replace = event if "_replace" in request.POST else None
+            recurrence_form = ReccurrenceFormClass(
+                request.POST, group=group, replace=replace
+            )
             if recurrence_form.is_valid():
-                recurrence_form.save(event)
-
-                messages.add_message(
-                    request, messages.SUCCESS, "Occurrence added successfully."
-                )
+                if replace is not None:
+                    recurrence_form.save(event, replace=True)
+                    message = "Following occurrences replaced successfully."
+                else:
+                    recurrence_form.save(event)
+                    message = "Occurrence added successfully."
+
+                messages.add_message(request, messages.SUCCESS, message)
                 return http.HttpResponseRedirect(request.path)
+        elif "_shift" in request.POST:
+            shift_form = forms.ShiftOccurrencesForm(request.POST)
+            if shift_form.is_valid():
+                try:
+                    count = shift_form.save(event)
+                except ValidationError as exc:
+                    shift_form.add_error(None, exc)
+                else:
+                    messages.add_message(
+                        request, messages.SUCCESS, f"{count} occurrence(s) moved."
+                    )
+                    return http.HttpResponseRedirect(request.path)
         elif "_delete" in request.POST:
             event.delete()
             return http.HttpResponseRedirect(
@@ -113,23 +173,97 @@ def event_view(
         else:
             return http.HttpResponseBadRequest("Bad Request")
 
-    occurrences = event.occurrence_set.all()
+    stats = event.occurrence_set.aggregate(
+        count=models.Count("id"),
+        first=models.Min("start_time"),
+        last=models.Max("end_time"),
+    )
+    # archived occurrences have no pages of their own, they are only counted
+    archived_stats = None
+    if archive_cutoff() is not None:
+        archived_stats = event.occurrencearchive_set.aggregate(
+            count=models.Count("id"),
+            first=models.Min("start_time"),
+            last=models.Max("end_time"),
+        )
+    occurrences, before, after = _occurrence_window(
+        event.occurrence_set.with_note_count(),
+        datetime.now(tz=pytz.utc),
+        stats,
+        jivetime_settings.PAGE_SIZE,
+    )
     nav_date = datetime.now()
-    if occurrences:
-        nav_date = occurrences[0].start_time.date()
+    if stats["first"]:
+        nav_date = stats["first"].date()
 
     data = {
         "today": date.today(),
         "group": event.group,
         "event": event,
         "occurrences": occurrences,
+        "occurrence_stats": stats,
+        "archived_stats": archived_stats,
+        "before_cursor": before,
+        "after_cursor": after,
         "event_form": event_form,
         "recurrence_form": recurrence_form,
+        "shift_form": shift_form,
         "scope_menu": get_scope_menu(group.id, nav_date),
     }
     return render(request, template, data)
 
 
+@use_replica
+@use_group_shard
+def event_occurrences_view(
+    request,
+    gid: int,
+    pk: int,
+    template="jivetime/include/occurrence_rows.html",
+):
+    """
+    Return a JSON document with the next page of an event's occurrences for
+    lazy loading into the ``event_view`` occurrence table. Exactly one of the
+    ``after`` or ``before`` query parameters carries the cursor to page from.
+
+    ``html``
+        the rendered table rows, in chronological order
+
+    ``cursor``
+        the cursor to continue paging in the same direction, or ``None`` when
+        there are no more occurrences
+
+    """
+    event = get_object_or_404(Event, pk=int(pk), group_id=int(gid))
+    backwards = "before" in request.GET
+    try:
+        key = _decode_occurrence_cursor(request.GET["before" if backwards else "after"])
+    except (KeyError, ValueError):
+        return http.HttpResponseBadRequest("Bad Request")
+
+    rows, last = utils.keyset_page(
+        event.occurrence_set.with_note_count(),
+        OCCURRENCE_KEY,
+        after=key,
+        size=jivetime_settings.PAGE_SIZE,
+        reverse=backwards,
+    )
+    if backwards:
+        rows.reverse()
+
+    with timed("render"):
+        html = render_to_string(
+            template,
+            {"group": event.group, "event": event, "occurrences": rows},
+            request=request,
+        )
+    return http.JsonResponse(
+        {"html": html, "cursor": _occurrence_cursor(last) if last else None}
+    )
+
+
+@pin_primary
+@use_group_shard
 def occurrence_view(
     request,
     gid: int,
@@ -162,6 +296,10 @@ def occurrence_view(
                 )
             )
 
+        if "_delete_following" in request.POST:
+            occurrence.event.truncate_occurrences(occurrence.start_time)
+            return http.HttpResponseRedirect(occurrence.event.get_absolute_url())
+
         form = form_class(request.POST, instance=occurrence)
         if form.is_valid():
             form.save()
@@ -186,6 +324,8 @@ def occurrence_view(
     )
 
 
+@method_decorator(pin_primary, name="dispatch")
+@method_decorator(use_group_shard, name="dispatch")
 class EventAddView(CreateView):
     model = Event
     template_name = "jivetime/add_event.html"
@@ -202,7 +342,7 @@ class EventAddView(CreateView):
 
     def post(self, request, *args, **kwargs):
         event_form = self.get_form()
-        recurrence_form = self.get_form_class_recc()(request.POST)
+        recurrence_form = self.get_form_class_recc()(request.POST, group=self.group)
 
         if event_form.is_valid() and recurrence_form.is_valid():
             event = event_form.save(commit=False)
@@ -267,13 +407,15 @@ def _datetime_view(request, template: str, group, dt: datetime, **params):
             "day": dt,
             "next_day": dt + timedelta(days=+1),
             "prev_day": dt + timedelta(days=-1),
-            "timeslots": utils.create_timeslot_table(dt, **params),
+            "timeslots": utils.create_timeslot_table(dt, group.id, **params),
             "scope_id": ScopeEnum.DAY,
             "scope_menu": get_scope_menu(group.id, dt),
         },
     )
 
 
+@use_replica
+@use_group_shard
 def day_view(
     request,
     gid: int,
@@ -292,6 +434,8 @@ def day_view(
     return _datetime_view(request, template, group, dt, **params)
 
 
+@use_replica
+@use_group_shard
 def today_view(request, gid: int, template="jivetime/daily_view.html", **params):
     """
     See documentation for function``_datetime_view``.
@@ -302,6 +446,8 @@ def today_view(request, gid: int, template="jivetime/daily_view.html", **params)
     return _datetime_view(request, template, group, dt, **params)
 
 
+@use_replica
+@use_group_shard
 def year_view(request, gid: int, year: int, template="jivetime/yearly_view.html"):
     """
 
@@ -346,14 +492,18 @@ def year_view(request, gid: int, year: int, template="jivetime/yearly_view.html"
         return redirect(reverse(f"jivetime:{scope}", args=args))
 
     year = int(year)
-    occurrences = Occurrence.objects.filter(
-        models.Q(start_time__year=year) | models.Q(end_time__year=year),
-        event__group_id=group.id,
-    )
+    start = timezone.make_aware(datetime(year, 1, 1))
+    with get_metrics().timer("jivetime_range_query_seconds", scope="year"):
+        occurrences = list(
+            Occurrence.objects.range_occurrences(
+                start, timezone.make_aware(datetime(year + 1, 1, 1)), group.id
+            )
+        )
 
     by_month = {date(year, idx, 1): [] for idx in range(1, 13)}
     for o in occurrences:
-        by_month[date(o.start_time.year, o.start_time.month, 1)].append(o)
+        month = timezone.localtime(max(o.start_time, start))
+        by_month[date(month.year, month.month, 1)].append(o)
 
     return render(
         request,
@@ -405,6 +555,8 @@ def get_event_group(group_id, key_type=int):
     return get_object_or_404(ModelClass, pk=key_type(group_id))
 
 
+@use_replica
+@use_group_shard
 def month_view(
     request,
     gid: int,
@@ -442,14 +594,16 @@ def month_view(
     dtstart = datetime(year, month, 1)
     last_day = max(cal_data[-1])
 
-    occurrences = Occurrence.objects.filter(
-        start_time__year=year,
-        start_time__month=month,
-        event__group_id=group.id,
-    ).select_related()
+    start = timezone.make_aware(dtstart)
+    with get_metrics().timer("jivetime_range_query_seconds", scope="month"):
+        occurrences = list(
+            Occurrence.objects.range_occurrences(
+                start, start + timedelta(days=last_day), group.id
+            )
+        )
 
     def start_day(o):
-        return o.start_time.day
+        return timezone.localtime(max(o.start_time, start)).day
 
     by_day = dict(
         [(dt, list(o)) for dt, o in itertools.groupby(occurrences, start_day)]
@@ -467,3 +621,247 @@ def month_view(
     }
 
     return render(request, template, data)
+
+
+def _parse_range(request, days: int = 7) -> Tuple[datetime, datetime]:
+    """
+    Parse the ``start`` and ``end`` query parameters into a pair of aware
+    datetimes. Naive values are treated as UTC; a missing ``start`` defaults to
+    the start of today and a missing ``end`` to ``start`` plus ``days``.
+
+    Raises ``ValueError`` for unparseable or inverted ranges.
+    """
+    if "start" in request.GET:
+        start = parser.parse(request.GET["start"])
+    else:
+        start = datetime.combine(date.today(), datetime.min.time())
+
+    if "end" in request.GET:
+        end = parser.parse(request.GET["end"])
+    else:
+        end = start + timedelta(days=days)
+
+    if start.tzinfo is None:
+        start = pytz.utc.localize(start)
+    if end.tzinfo is None:
+        end = pytz.utc.localize(end)
+    if end <= start:
+        raise ValueError("end must be after start")
+
+    return start, end
+
+
+OCCURRENCE_KEY = ("start_time", "id")
+
+
+def _occurrence_cursor(key) -> str:
+    start_time, pk = key
+    return utils.encode_cursor(start_time.isoformat(), pk)
+
+
+def _decode_event_cursor(cursor: str) -> Tuple[str, int]:
+    try:
+        title, pk = utils.decode_cursor(cursor)
+        if not isinstance(title, str):
+            raise TypeError("invalid title")
+        return title, int(pk)
+    except (TypeError, ValueError, OverflowError) as exc:
+        raise ValueError("invalid cursor") from exc
+
+
+def _decode_occurrence_cursor(cursor: str) -> Tuple[datetime, int]:
+    try:
+        start_time, pk = utils.decode_cursor(cursor)
+        return parser.isoparse(start_time), int(pk)
+    except (TypeError, ValueError, OverflowError) as exc:
+        raise ValueError("invalid cursor") from exc
+
+
+def _occurrence_window(occurrences, around: datetime, stats: dict, size: int):
+    """
+    Return a 3-tuple of up to ``size`` ``occurrences`` starting at ``around``,
+    and the cursors for paging before and after them (or ``None``). If all
+    occurrences are in the past, the last page is returned instead.
+
+    ``stats`` is the ``count``/``first`` aggregate of ``occurrences``, used to
+    tell whether earlier rows exist without another query.
+
+    """
+    rows, last = utils.keyset_page(
+        occurrences.filter(start_time__gte=around), OCCURRENCE_KEY, size=size
+    )
+    if rows:
+        before = None
+        if stats["first"] < around:
+            before = _occurrence_cursor((rows[0].start_time, rows[0].id))
+        after = _occurrence_cursor(last) if last else None
+        return rows, before, after
+
+    if not stats["count"]:
+        return [], None, None
+
+    rows, first = utils.keyset_page(
+        occurrences, OCCURRENCE_KEY, size=size, reverse=True
+    )
+    rows.reverse()
+    return rows, _occurrence_cursor(first) if first else None, None
+
+
+def _occurrence_data(occurrence) -> dict:
+    return {
+        "id": occurrence.id,
+        "event_id": occurrence.event_id,
+        "title": occurrence.title,
+        "start_time": occurrence.start_time.isoformat(),
+        "end_time": occurrence.end_time.isoformat(),
+    }
+
+
+def _agenda_page(request, gid: int):
+    group = get_event_group(gid)
+    after = None
+    if "after" in request.GET:
+        after = _decode_occurrence_cursor(request.GET["after"])
+
+    rows, last = utils.keyset_page(
+        Occurrence.objects.upcoming(group),
+        OCCURRENCE_KEY,
+        after=after,
+        size=jivetime_settings.PAGE_SIZE,
+    )
+    return group, rows, _occurrence_cursor(last) if last else None
+
+
+@use_replica
+@use_group_shard
+def agenda_view(request, gid: int, template="jivetime/agenda.html"):
+    """
+    Render the upcoming occurrences of all events of a group in start time
+    order, one keyset paginated page at a time. The ``after`` query parameter
+    carries the cursor of the previous page.
+
+    Context parameters:
+
+    ``occurrences``
+        a list of ``Occurrence`` objects
+
+    ``next_cursor``
+        the cursor for the following page, or ``None`` on the last page
+
+    """
+    try:
+        group, occurrences, next_cursor = _agenda_page(request, gid)
+    except ValueError:
+        return http.HttpResponseBadRequest("Bad Request")
+
+    data = {
+        "group": group,
+        "occurrences": occurrences,
+        "next_cursor": next_cursor,
+    }
+    return render(request, template, data)
+
+
+@use_replica
+@use_group_shard
+def agenda_api_view(request, gid: int):
+    """
+    Return a JSON document with one page of the agenda, see ``agenda_view``.
+
+    ``occurrences``
+        a list of occurrences ordered by start time
+
+    ``cursor``
+        the cursor for the following page, or ``None`` on the last page
+
+    """
+    try:
+        group, occurrences, next_cursor = _agenda_page(request, gid)
+    except ValueError:
+        return http.HttpResponseBadRequest("Bad Request")
+
+    return http.JsonResponse(
+        {
+            "group": group.id,
+            "occurrences": [_occurrence_data(o) for o in occurrences],
+            "cursor": next_cursor,
+        }
+    )
+
+
+@use_replica
+@use_group_shard
+def conflicts_view(request, gid: int):
+    """
+    Return a JSON document listing the overlapping occurrences of a group
+    within the ``start`` and ``end`` query parameter range.
+
+    ``pairs``
+        a list of ``[earlier_id, later_id]`` occurrence pairs that overlap
+
+    ``clusters``
+        a list of lists of occurrences that are transitively overlapping
+
+    """
+    group = get_event_group(gid)
+    try:
+        start, end = _parse_range(request)
+    except (ValueError, OverflowError):
+        return http.HttpResponseBadRequest("Bad Request")
+
+    with get_metrics().timer("jivetime_range_query_seconds", scope="conflicts"):
+        occurrences = list(Occurrence.objects.range_occurrences(start, end, group))
+    return http.JsonResponse(
+        {
+            "group": group.id,
+            "start": start.isoformat(),
+            "end": end.isoformat(),
+            "pairs": [[a.id, b.id] for a, b in utils.overlapping_pairs(occurrences)],
+            "clusters": [
+                [_occurrence_data(o) for o in cluster]
+                for cluster in utils.overlapping_clusters(occurrences)
+            ],
+        }
+    )
+
+
+@use_replica
+@use_group_shard
+def free_busy_view(request, gid: int):
+    """
+    Return a JSON document listing the merged busy intervals of a group within
+    the ``start`` and ``end`` query parameter range.
+
+    ``busy``
+        a list of disjoint ``[start, end]`` ISO 8601 pairs, ordered by start
+
+    """
+    group = get_event_group(gid)
+    try:
+        start, end = _parse_range(request)
+    except (ValueError, OverflowError):
+        return http.HttpResponseBadRequest("Bad Request")
+
+    busy = utils.free_busy(group, start, end)
+    return http.JsonResponse(
+        {
+            "group": group.id,
+            "start": start.isoformat(),
+            "end": end.isoformat(),
+            "busy": [[st.isoformat(), et.isoformat()] for st, et in busy],
+        }
+    )
+
+
+def metrics_view(request):
+    """
+    Return the metrics of the current process in the Prometheus text
+    exposition format, or a 404 unless the metrics backend exposes them.
+    """
+    metrics = get_metrics()
+    if not metrics.exposed:
+        raise http.Http404("Metrics are not exposed")
+
+    return http.HttpResponse(
+        metrics.render(), content_type="text/plain; version=0.0.4; charset=utf-8"
+    )
@@ -29,6 +29,7 @@ setup(
     install_requires=["Django>=2.2,<4.1", "python-dateutil==2.8.2"],
     extras_require={
         "test": ["tox", "coverage", "pytest-django", "pytest", "pytest-cov", "flake8"],
+        "benchmark": ["pytest-django", "pytest-benchmark", "psycopg2-binary"],
     },
     classifiers=[
         "Development Status :: 5 - Production/Stable",
@@ -1,14 +1,58 @@
+from copy import copy
 from datetime import datetime, timezone
 
 import pytest
 from django.contrib.auth import get_user_model
 from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import connections
 
+from jivetime.cache import event_types
+from jivetime.metrics import get_metrics
 from jivetime.models import Event, EventGroup, EventType, Occurrence
 
 GROUP_DEFAULT_ID = 1
 
 
+@pytest.fixture(autouse=True)
+def clear_cache():
+    # the test database is rebuilt per test, cached versions must follow suit
+    cache.clear()
+    event_types.invalidate()
+    yield
+    cache.clear()
+
+
+@pytest.fixture(scope="session")
+def unconstrained_shard(django_db_setup, django_db_blocker):
+    """
+    Drop the foreign keys of events on the "shard" test database, as
+    ``EVENT_FOREIGN_KEY_CONSTRAINTS = False`` would: events sharded there
+    reference event groups and event types kept on the default database.
+    """
+    fields = [Event._meta.get_field(name) for name in ("group", "event_type")]
+    constraints = [field.db_constraint for field in fields]
+    with django_db_blocker.unblock():
+        with connections["shard"].schema_editor() as editor:
+            try:
+                for field in fields:
+                    old = copy(field)
+                    # SQLite rebuilds the table from the model, which must
+                    # keep the fields altered so far unconstrained
+                    field.db_constraint = False
+                    editor.alter_field(Event, old, field)
+            finally:
+                for field, constraint in zip(fields, constraints):
+                    field.db_constraint = constraint
+
+
+@pytest.fixture
+def metrics():
+    metrics = get_metrics()
+    metrics.clear()
+    return metrics
+
+
 @pytest.fixture
 def group_default():
     def create_group(**kwargs):
@@ -0,0 +1,109 @@
+"""
+Query budgets of the jivetime views. Each view is measured on a small and on a
+large group, so that a query issued per occurrence, event or note fails.
+"""
+from collections import namedtuple
+from datetime import timedelta
+
+import pytest
+from dateutil import rrule
+from django.urls import reverse
+from django.utils import timezone
+
+from jivetime.models import create_events_bulk
+from jivetime.retention import purge_occurrences
+
+SIZES = [10, 1000]
+
+# Maximum number of queries of each view, whatever the size of the group.
+BUDGETS = {
+    "calendar-day": 3,
+    "calendar-today": 3,
+    "calendar-month": 3,
+    "calendar-year": 3,
+    # including the archive cutoff lookup, cached after the first request
+    "event-detail": 9,
+    "event-occurrence": 3,
+    "event-list": 2,
+    "event-add": 3,
+}
+
+Dataset = namedtuple("Dataset", "group event occurrence day")
+
+
+def view_url(name: str, dataset: Dataset) -> str:
+    group, day = dataset.group.id, dataset.day
+    args = {
+        "calendar-day": [group, day.year, day.month, day.day],
+        "calendar-today": [group],
+        "calendar-month": [group, day.year, day.month],
+        "calendar-year": [group, day.year],
+        "event-detail": [group, dataset.event.id],
+        "event-occurrence": [group, dataset.event.id, dataset.occurrence.id],
+        "event-list": [group],
+        "event-add": [group],
+    }
+    return reverse("jivetime:{}".format(name), args=args[name])
+
+
+@pytest.fixture(params=SIZES, ids="{}occ".format)
+def dataset(request, db, group_default):
+    """
+    A group with ``request.param`` occurrences from today on: half of them
+    hourly occurrences of a single event, the others daily occurrences of
+    many events of several types, each event with a note.
+    """
+    size = request.param
+    group = group_default()
+    day = timezone.localtime().replace(hour=0, minute=0, second=0, microsecond=0)
+    day = day.replace(tzinfo=None)
+    specs = [
+        dict(
+            title="hourly",
+            event_type=("hrly", "Hourly"),
+            group=group,
+            start_time=day,
+            end_time=day + timedelta(minutes=30),
+            freq=rrule.HOURLY,
+            count=size // 2,
+            note="hourly note",
+        )
+    ]
+    for number in range(size // 10):
+        specs.append(
+            dict(
+                title="daily {}".format(number),
+                event_type=("dly{}".format(number % 5), "Daily"),
+                group=group,
+                start_time=day + timedelta(hours=9),
+                freq=rrule.DAILY,
+                count=5,
+                note="daily note",
+            )
+        )
+
+    event = create_events_bulk(specs)[0][0]
+    return Dataset(group, event, event.occurrence_set.last(), day)
+
+
+@pytest.mark.parametrize("name", BUDGETS)
+def test_view_queries(name, client, dataset, django_assert_max_num_queries):
+    url = view_url(name, dataset)
+    with django_assert_max_num_queries(BUDGETS[name]):
+        response = client.get(url)
+
+    assert response.status_code == 200
+
+
+@pytest.mark.parametrize(
+    "name", ["calendar-day", "calendar-month", "calendar-year", "event-detail"]
+)
+def test_archived_view_queries(name, client, dataset, django_assert_max_num_queries):
+    # ranges reaching back before the archive cutoff union both tables
+    before = timezone.make_aware(dataset.day + timedelta(days=3))
+    list(purge_occurrences(before, archive=True))
+    url = view_url(name, dataset)
+    with django_assert_max_num_queries(BUDGETS[name]):
+        response = client.get(url)
+
+    assert response.status_code == 200
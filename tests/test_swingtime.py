@@ -1,13 +1,39 @@
-from datetime import date, datetime, time, timezone
+import json
+from datetime import date, datetime, time, timedelta, timezone
+from io import StringIO
 
 import pytest
+import pytz
 from dateutil import rrule
+from django import forms
+from django.contrib.auth.models import User
+from django.core.exceptions import ValidationError
+from django.core.management import CommandError, call_command
+from django.db import IntegrityError
 from django.forms.models import model_to_dict
-from django.urls import reverse
+from django.urls import ResolverMatch, reverse
 
-from jivetime import utils
-from jivetime.forms import EventForm, MultipleOccurrenceForm
-from jivetime.models import Event, EventType, create_event
+from jivetime import utils, views
+from jivetime.cache import archive_cutoff, event_types
+from jivetime.conf import jivetime_settings
+from jivetime.dataset import generate
+from jivetime.forms import EventForm, MultipleOccurrenceForm, SingleOccurrenceForm
+from jivetime.metrics import Metrics
+from jivetime.models import (
+    Event,
+    EventGroup,
+    EventType,
+    Note,
+    Occurrence,
+    OccurrenceArchive,
+    ReminderDelivery,
+    create_event,
+    create_events_bulk,
+)
+from jivetime.retention import purge_occurrences
+from jivetime.routers import shard_for_group, using_group
+from jivetime.scheduler import ReminderScheduler
+from jivetime.timing import server_timing
 
 expected_table_1 = """\
 | 15:00 |          |          |          |          |          |
@@ -285,6 +311,1479 @@ class TestCreation:
         assert e.occurrence_set.count() == 31
 
 
+@pytest.mark.django_db
+class TestConflicts:
+    start = datetime(2008, 12, 11, tzinfo=timezone.utc)
+    end = datetime(2008, 12, 12, tzinfo=timezone.utc)
+
+    def test_range_occurrences(self, events, group_default):
+        qs = Occurrence.objects.range_occurrences(
+            datetime(2008, 12, 11, 17, 0, tzinfo=timezone.utc),
+            datetime(2008, 12, 11, 17, 30, tzinfo=timezone.utc),
+            group_default(),
+        )
+        assert [o.title for o in qs] == ["alpha", "delta", "echo"]
+
+    def test_sweep_matches_pairwise(self, events, group_default):
+        occs = list(
+            Occurrence.objects.range_occurrences(self.start, self.end, group_default())
+        )
+        expected = {
+            frozenset((a.id, b.id))
+            for i, a in enumerate(occs)
+            for b in occs[i + 1 :]
+            if a.start_time < b.end_time and b.start_time < a.end_time
+        }
+        actual = {frozenset((a.id, b.id)) for a, b in utils.overlapping_pairs(occs)}
+        assert actual == expected
+
+        clusters = utils.overlapping_clusters(occs)
+        assert len(clusters) == 1
+        assert len(clusters[0]) == 7
+
+    def test_conflicts_view(self, client, events, group_default):
+        url = reverse("jivetime:calendar-conflicts", args=[group_default().id])
+        r = client.get(url, {"start": "2008-12-11", "end": "2008-12-11T16:10"})
+        assert r.status_code == 200
+        data = r.json()
+        titles = [[o["title"] for o in c] for c in data["clusters"]]
+        assert titles == [["zelda", "alpha", "bravo", "foxtrot"]]
+        assert len(data["pairs"]) == 4
+
+        r = client.get(url, {"start": "2008-12-12", "end": "2008-12-11"})
+        assert r.status_code == 400
+
+    def test_form_conflicts(self, events, group_default, monkeypatch):
+        monkeypatch.setattr(jivetime_settings, "CHECK_CONFLICTS", True)
+        data = dict(
+            day="2008-12-11",
+            start_time_delta="57600",
+            end_time_delta="59400",
+            repeats="count",
+            count=3,
+            freq=rrule.WEEKLY,
+            week_days=["4"],
+            month_option="each",
+        )
+        form = MultipleOccurrenceForm(data, group=group_default())
+        assert not form.is_valid()
+        assert form.errors["__all__"][0].startswith("1 occurrence(s) conflict")
+
+        form = MultipleOccurrenceForm(
+            dict(data, day="2008-12-18"), group=group_default()
+        )
+        assert form.is_valid(), form.errors
+
+        occurrence = events.get(title="zelda").occurrence_set.get()
+        form = SingleOccurrenceForm(
+            {
+                "start_time": "2008-12-11T16:00:00+00:00",
+                "end_time": "2008-12-11T16:30:00+00:00",
+            },
+            instance=occurrence,
+        )
+        assert not form.is_valid()
+
+        class EventOccurrenceForm(SingleOccurrenceForm):
+            event = forms.ModelChoiceField(Event.objects.all())
+
+        data = {
+            "event": events.get(title="bravo").id,
+            "start_time": "2008-12-11T15:15:00+00:00",
+            "end_time": "2008-12-11T15:45:00+00:00",
+        }
+        form = EventOccurrenceForm(data)
+        assert not form.is_valid()
+        assert form.errors["__all__"][0] == "Occurrence conflicts with zelda"
+
+        other_group = EventGroup.objects.create(
+            name="other", owner=group_default().owner
+        )
+        other = Event.objects.create(title="other", group=other_group)
+        form = EventOccurrenceForm(dict(data, event=other.id), instance=occurrence)
+        assert form.is_valid(), form.errors
+
+    def test_replace_conflicts(self, group_default, monkeypatch):
+        monkeypatch.setattr(jivetime_settings, "CHECK_CONFLICTS", True)
+        group = group_default()
+        event = create_event(
+            "a",
+            None,
+            group,
+            start_time=datetime(2008, 1, 1, 9),
+            freq=rrule.DAILY,
+            count=5,
+        )
+        data = dict(
+            day="2008-01-01",
+            start_time_delta="32400",
+            end_time_delta="36000",
+            repeats="count",
+            count=5,
+            freq=rrule.DAILY,
+            month_option="each",
+        )
+        form = MultipleOccurrenceForm(data, group=group)
+        assert not form.is_valid()
+
+        form = MultipleOccurrenceForm(data, group=group, replace=event)
+        assert form.is_valid(), form.errors
+        form.save(event, replace=True)
+        assert event.occurrence_set.count() == 5
+
+        # other events' occurrences still conflict
+        create_event("b", None, group, start_time=datetime(2008, 1, 4, 9))
+        form = MultipleOccurrenceForm(
+            dict(data, day="2008-01-03", count=2), group=group, replace=event
+        )
+        assert not form.is_valid()
+        assert "with b" in form.errors["__all__"][0]
+
+
+@pytest.mark.django_db
+class TestFreeBusy:
+    start = datetime(2008, 12, 11, tzinfo=timezone.utc)
+    end = datetime(2008, 12, 12, tzinfo=timezone.utc)
+
+    def test_free_busy(self, events, group_default):
+        busy = utils.free_busy(group_default(), self.start, self.end)
+        assert busy == [
+            (
+                datetime(2008, 12, 11, 15, 15, tzinfo=timezone.utc),
+                datetime(2008, 12, 11, 18, 0, tzinfo=timezone.utc),
+            )
+        ]
+
+        clipped = utils.free_busy(
+            group_default(),
+            datetime(2008, 12, 11, 17, 0, tzinfo=timezone.utc),
+            datetime(2008, 12, 11, 17, 30, tzinfo=timezone.utc),
+        )
+        assert clipped == [
+            (
+                datetime(2008, 12, 11, 17, 0, tzinfo=timezone.utc),
+                datetime(2008, 12, 11, 17, 30, tzinfo=timezone.utc),
+            )
+        ]
+
+    def test_cache_invalidation(self, events, group_default, django_assert_num_queries):
+        group = group_default()
+        utils.free_busy(group, self.start, self.end)
+        with django_assert_num_queries(0):
+            utils.free_busy(group, self.start, self.end)
+
+        events.get(title="echo").add_occurrences(
+            datetime(2008, 12, 11, 20), datetime(2008, 12, 11, 21)
+        )
+        busy = utils.free_busy(group, self.start, self.end)
+        assert len(busy) == 2
+
+    def test_free_busy_view(self, client, events, group_default):
+        url = reverse("jivetime:calendar-free-busy", args=[group_default().id])
+        r = client.get(url, {"start": "2008-12-11", "end": "2008-12-12"})
+        assert r.status_code == 200
+        assert r.json()["busy"] == [
+            ["2008-12-11T15:15:00+00:00", "2008-12-11T18:00:00+00:00"]
+        ]
+
+
+@pytest.mark.django_db
+class TestFreeSlots:
+    window = (
+        datetime(2008, 12, 11, 15, 0, tzinfo=timezone.utc),
+        datetime(2008, 12, 11, 19, 0, tzinfo=timezone.utc),
+    )
+
+    def starts(self, slots):
+        return [st.strftime("%H:%M") for st, et in slots]
+
+    def test_single_group(self, events, group_default):
+        slots = utils.find_free_slots(
+            [group_default()], timedelta(minutes=30), self.window
+        )
+        assert self.starts(slots) == ["18:00", "18:15", "18:30"]
+        assert slots[0][1] == datetime(2008, 12, 11, 18, 30, tzinfo=timezone.utc)
+
+        slots = utils.find_free_slots(
+            [group_default()], timedelta(minutes=30), self.window, limit=1
+        )
+        assert self.starts(slots) == ["18:00"]
+
+    def test_common_to_groups(self, events, group_default):
+        other = EventGroup.objects.create(
+            name="other", owner=group_default().owner, timezone="UTC"
+        )
+        create_event(
+            "busy",
+            ("busy", "Busy"),
+            other,
+            start_time=datetime(2008, 12, 11, 18, 0),
+            end_time=datetime(2008, 12, 11, 18, 20),
+        )
+        slots = utils.find_free_slots(
+            [group_default(), other], timedelta(minutes=30), self.window
+        )
+        assert self.starts(slots) == ["18:30"]
+
+
+@pytest.mark.django_db
+class TestShift:
+    def test_shift_occurrences(self, group_default):
+        e = create_event(
+            "Weekly",
+            ("wkly", "Weekly"),
+            group_default(),
+            start_time=datetime(2008, 1, 1, 9),
+            freq=rrule.WEEKLY,
+            count=4,
+        )
+        assert e.shift_occurrences(timedelta(hours=2)) == 4
+        assert [o.start_time.hour for o in e.occurrence_set.all()] == [11] * 4
+
+        from_time = datetime(2008, 1, 15, tzinfo=timezone.utc)
+        assert e.shift_occurrences(timedelta(days=1), from_time) == 2
+        days = [o.start_time.day for o in e.occurrence_set.all()]
+        assert days == [1, 8, 16, 23]
+
+    def test_shift_conflicts(self, events):
+        zelda = events.get(title="zelda")
+        with pytest.raises(ValidationError):
+            zelda.shift_occurrences(timedelta(hours=1))
+        assert zelda.occurrence_set.get().start_time.hour == 15
+
+        assert zelda.shift_occurrences(timedelta(hours=3)) == 1
+
+    def test_shift_view_and_admin(self, client, occurrence, group_default):
+        event = occurrence.event
+        url = reverse("jivetime:event-detail", args=[group_default().id, event.id])
+        r = client.post(url, {"_shift": "", "delta": "01:00:00"})
+        assert r.status_code == 302
+        assert event.occurrence_set.get().start_time.hour == 17
+
+        admin = User.objects.create_superuser("admin", "admin@example.com", "pw")
+        client.force_login(admin)
+        url = reverse("admin:jivetime_event_changelist")
+        data = {"action": "shift_occurrences", "_selected_action": [event.id]}
+        r = client.post(url, data)
+        assert r.status_code == 200
+
+        r = client.post(url, dict(data, apply="", delta="-01:00:00"))
+        assert r.status_code == 302
+        assert event.occurrence_set.get().start_time.hour == 16
+
+    def test_admin_shifts_events_together(self, client, group_default):
+        group = group_default()
+        # the admin moves the later created, earlier starting event first
+        second, first, other = [
+            create_event(
+                title,
+                ("meet", "Meeting"),
+                group,
+                start_time=datetime(2008, 1, 1, hour),
+            )
+            for title, hour in (("second", 10), ("first", 9), ("other", 12))
+        ]
+        admin = User.objects.create_superuser("admin", "admin@example.com", "pw")
+        client.force_login(admin)
+        url = reverse("admin:jivetime_event_changelist")
+        data = {
+            "action": "shift_occurrences",
+            "_selected_action": [first.id, second.id],
+            "apply": "",
+        }
+
+        # each lands where the other was
+        r = client.post(url, dict(data, delta="01:00:00"))
+        assert r.status_code == 302
+        assert second.occurrence_set.get().start_time.hour == 11
+
+        r = client.post(url, dict(data, delta="01:00:00"), follow=True)
+        assert "would conflict with other" in r.content.decode()
+        assert first.occurrence_set.get().start_time.hour == 10
+
+
+@pytest.mark.django_db
+class TestEventOccurrencePages:
+    def daily(self, group, start):
+        return create_event(
+            "Daily",
+            ("dly", "Daily"),
+            group,
+            start_time=start.replace(tzinfo=None),
+            freq=rrule.DAILY,
+            count=10,
+        )
+
+    def load(self, client, url, direction, cursor):
+        pages = []
+        while cursor:
+            r = client.get(url, {direction: cursor})
+            assert r.status_code == 200
+            data = r.json()
+            pages.append(data["html"].count("See Details"))
+            cursor = data["cursor"]
+        return pages
+
+    def test_window_around_now(self, client, group_default, monkeypatch):
+        monkeypatch.setattr(jivetime_settings, "PAGE_SIZE", 3)
+        now = datetime.now(timezone.utc).replace(microsecond=0)
+        event = self.daily(group_default(), now - timedelta(days=5, hours=12))
+        gid = group_default().id
+
+        r = client.get(reverse("jivetime:event-detail", args=[gid, event.id]))
+        assert r.status_code == 200
+        assert [o.start_time > now for o in r.context["occurrences"]] == [True] * 3
+        stats = r.context["occurrence_stats"]
+        assert stats["count"] == 10
+        assert stats["first"] == event.occurrence_set.first().start_time
+        assert stats["last"] == event.occurrence_set.last().end_time
+
+        url = reverse("jivetime:event-occurrences", args=[gid, event.id])
+        assert self.load(client, url, "after", r.context["after_cursor"]) == [1]
+        assert self.load(client, url, "before", r.context["before_cursor"]) == [
+            3,
+            3,
+        ]
+        assert client.get(url).status_code == 400
+        assert client.get(url, {"after": "e30"}).status_code == 400
+
+    def test_window_in_past(self, client, group_default, monkeypatch):
+        monkeypatch.setattr(jivetime_settings, "PAGE_SIZE", 3)
+        event = self.daily(group_default(), datetime(2008, 1, 1, 9))
+        url = reverse("jivetime:event-detail", args=[group_default().id, event.id])
+
+        r = client.get(url)
+        assert [o.start_time.day for o in r.context["occurrences"]] == [8, 9, 10]
+        assert r.context["before_cursor"]
+        assert r.context["after_cursor"] is None
+
+
+@pytest.mark.django_db
+class TestTruncate:
+    def weekly(self, group):
+        return create_event(
+            "Weekly",
+            ("wkly", "Weekly"),
+            group,
+            start_time=datetime(2008, 1, 1, 9),
+            freq=rrule.WEEKLY,
+            count=4,
+        )
+
+    def test_truncate_and_replace(self, group_default):
+        e = self.weekly(group_default())
+        from_time = datetime(2008, 1, 15, tzinfo=timezone.utc)
+        assert e.truncate_occurrences(from_time) == 2
+        assert e.occurrence_set.count() == 2
+
+        deleted = e.replace_occurrences(
+            datetime(2008, 1, 8, tzinfo=timezone.utc),
+            datetime(2008, 1, 9, 18),
+            datetime(2008, 1, 9, 19),
+            freq=rrule.DAILY,
+            count=3,
+        )
+        assert deleted == 1
+        days = [o.start_time.day for o in e.occurrence_set.all()]
+        assert days == [1, 9, 10, 11]
+
+    def test_delete_following_view(self, client, group_default):
+        e = self.weekly(group_default())
+        occ = e.occurrence_set.all()[1]
+        url = reverse(
+            "jivetime:event-occurrence", args=[group_default().id, e.id, occ.id]
+        )
+        r = client.post(url, {"_delete_following": ""})
+        assert r.status_code == 302
+        assert e.occurrence_set.count() == 1
+
+
+@pytest.mark.django_db
+class TestSeries:
+    def test_series_link(self, group_default):
+        e = create_event(
+            "Weekly",
+            ("wkly", "Weekly"),
+            group_default(),
+            start_time=datetime(2008, 1, 1, 9),
+            freq=rrule.WEEKLY,
+            count=4,
+        )
+        e.add_occurrences(datetime(2008, 2, 1, 9), datetime(2008, 2, 1, 10))
+        series = e.series_set.get()
+        assert series.occurrence_set.count() == 4
+        assert series.duration == timedelta(hours=1)
+        assert list(series.rrule()) == [datetime(2008, 1, d, 9) for d in (1, 8, 15, 22)]
+
+        assert series.shift_occurrences(timedelta(days=1)) == 4
+        days = [o.start_time.day for o in e.occurrence_set.all()]
+        assert days == [2, 9, 16, 23, 1]
+
+        assert series.truncate_occurrences() == 4
+        assert e.occurrence_set.count() == 1
+
+
+@pytest.mark.django_db
+class TestMaterialization:
+    @pytest.fixture
+    def start(self, monkeypatch):
+        monkeypatch.setattr(
+            jivetime_settings, "MATERIALIZE_HORIZON", timedelta(days=20)
+        )
+        now = datetime.now(timezone.utc).replace(tzinfo=None)
+        return now.replace(minute=0, second=0, microsecond=0) + timedelta(hours=1)
+
+    def weekly(self, group, start):
+        return create_event(
+            "Weekly", ("wkly", "Weekly"), group, start_time=start, freq=rrule.WEEKLY
+        )
+
+    def test_extend(self, group_default, start, monkeypatch):
+        e = self.weekly(group_default(), start)
+        series = e.series_set.get()
+        assert e.occurrence_set.count() == 3
+        assert series.materialized_until > pytz.utc.localize(start + timedelta(days=19))
+
+        assert series.extend(start + timedelta(days=30)) == 2
+        assert series.extend(start + timedelta(days=30)) == 0
+        starts = [o.start_time.replace(tzinfo=None) for o in e.occurrence_set.all()]
+        assert starts == [start + timedelta(weeks=n) for n in range(5)]
+        assert Event.objects.get(pk=e.pk).occurrence_count == 5
+
+        monkeypatch.setattr(
+            jivetime_settings, "MATERIALIZE_HORIZON", timedelta(days=40)
+        )
+        out = StringIO()
+        call_command("jivetime_extend_series", stdout=out)
+        assert out.getvalue().strip() == "Created 1 occurrence(s) for 1 series."
+        assert e.occurrence_set.count() == 6
+
+    def test_extend_after_shift(self, group_default, start):
+        e = self.weekly(group_default(), start)
+        e.shift_occurrences(timedelta(hours=3))
+        series = e.series_set.get()
+        assert series.offset == timedelta(hours=3)
+
+        assert series.extend(start + timedelta(days=30)) == 2
+        starts = [o.start_time.replace(tzinfo=None) for o in e.occurrence_set.all()]
+        assert starts == [start + timedelta(weeks=n, hours=3) for n in range(5)]
+
+        series.shift_occurrences(timedelta(days=-1))
+        series.refresh_from_db()
+        assert series.extend(start + timedelta(days=40)) == 1
+        starts = [o.start_time.replace(tzinfo=None) for o in e.occurrence_set.all()]
+        assert starts == [start + timedelta(weeks=n, hours=-21) for n in range(6)]
+
+    def test_truncate_ends_series(self, group_default, start):
+        e = self.weekly(group_default(), start)
+        e.truncate_occurrences(pytz.utc.localize(start + timedelta(days=1)))
+        series = e.series_set.get()
+        assert series.until == pytz.utc.localize(start + timedelta(days=1))
+        assert series.extend(start + timedelta(days=60)) == 0
+        assert e.occurrence_set.count() == 1
+
+    def test_truncate_beyond_horizon(self, group_default, start, monkeypatch):
+        e = self.weekly(group_default(), start)
+        assert (
+            e.truncate_occurrences(pytz.utc.localize(start + timedelta(weeks=5))) == 0
+        )
+
+        series = e.series_set.get()
+        assert series.extend(start + timedelta(days=60)) == 2
+        starts = [o.start_time.replace(tzinfo=None) for o in e.occurrence_set.all()]
+        assert starts == [start + timedelta(weeks=n) for n in range(5)]
+
+        monkeypatch.setattr(
+            jivetime_settings, "MATERIALIZE_HORIZON", timedelta(days=90)
+        )
+        out = StringIO()
+        call_command("jivetime_extend_series", stdout=out)
+        assert out.getvalue().strip() == "Created 0 occurrence(s) for 0 series."
+
+    def test_form_and_bulk(self, group_default, start):
+        form = MultipleOccurrenceForm(
+            dict(
+                day=start.date(),
+                start_time_delta=str(start.hour * 3600),
+                end_time_delta=str(start.hour * 3600 + 3600),
+                repeats="forever",
+                month_option="each",
+                freq=rrule.DAILY,
+                interval=1,
+            )
+        )
+        assert form.is_valid(), form.errors
+        event = form.save(Event.objects.create(title="daily", group=group_default()))
+        assert event.occurrence_set.count() == 20
+
+        (bulk,), timings = create_events_bulk(
+            [
+                dict(
+                    title="bulk",
+                    event_type=None,
+                    group=group_default(),
+                    start_time=start,
+                    freq=rrule.WEEKLY,
+                )
+            ]
+        )
+        assert bulk.occurrence_set.count() == 3
+        assert bulk.series_set.get().materialized_until is not None
+
+
+@pytest.mark.django_db
+class TestBulkCreation:
+    def test_create_events_bulk(
+        self, play_type, group_default, django_assert_max_num_queries
+    ):
+        group = group_default()
+        specs = [
+            dict(title="one", event_type=play_type, group=group, note="first"),
+            dict(
+                title="two",
+                event_type=("play", "Play"),
+                group=group,
+                start_time=datetime(2008, 1, 1, 9),
+                freq=rrule.DAILY,
+                count=10,
+            ),
+            dict(
+                title="three",
+                event_type=("new", "New"),
+                group=group,
+                start_time=datetime(2008, 1, 1, 9),
+                until=datetime(2008, 1, 31),
+            ),
+        ]
+        with django_assert_max_num_queries(10):
+            events, timings = create_events_bulk(specs)
+
+        assert [e.title for e in events] == ["one", "two", "three"]
+        assert events[1].event_type == play_type
+        assert EventType.objects.get(abbr="new").label == "New"
+        assert [e.occurrence_set.count() for e in events] == [1, 10, 30]
+        assert events[0].notes.get().note == "first"
+        assert events[2].series_set.get().occurrence_set.count() == 30
+        assert set(timings) == {
+            "event_types",
+            "events",
+            "notes",
+            "expansion",
+            "occurrences",
+        }
+
+    def test_generate(self):
+        def rows(group):
+            return list(
+                Occurrence.objects.filter(event__group=group)
+                .order_by("start_time", "event__title")
+                .values_list("event__title", "start_time", "end_time")
+            )
+
+        first, second = generate(2, occurrences=500, seed=7, batch_size=10)
+        assert Occurrence.objects.filter(event__group=first).count() == 500
+        assert Occurrence.objects.filter(event__group=second).count() == 500
+        assert rows(first) != rows(second)
+
+        [again] = generate(occurrences=500, seed=7)
+        assert rows(again) == rows(first)
+
+        out = StringIO()
+        call_command("jivetime_generate", "--groups", "2", "--events", "20", stdout=out)
+        assert out.getvalue().startswith("Created 2 group(s), 40 event(s) and ")
+        with pytest.raises(CommandError):
+            call_command("jivetime_generate", "--events", "0")
+
+
+@pytest.mark.django_db
+class TestOccurrenceStats:
+    def stats(self, event):
+        event = Event.objects.get(pk=event.pk)
+        return event.next_start, event.last_end, event.occurrence_count
+
+    def utc(self, *args):
+        return datetime(*args, tzinfo=timezone.utc)
+
+    def test_write_paths(self, group_default):
+        e = create_event(
+            "Daily",
+            ("dly", "Daily"),
+            group_default(),
+            start_time=datetime(2100, 1, 1, 9),
+            freq=rrule.DAILY,
+            count=5,
+        )
+        assert self.stats(e) == (self.utc(2100, 1, 1, 9), self.utc(2100, 1, 5, 10), 5)
+
+        e.shift_occurrences(timedelta(days=1))
+        assert self.stats(e)[0] == self.utc(2100, 1, 2, 9)
+
+        e.truncate_occurrences(self.utc(2100, 1, 4))
+        assert self.stats(e) == (self.utc(2100, 1, 2, 9), self.utc(2100, 1, 3, 10), 2)
+
+        e.occurrence_set.first().delete()
+        assert self.stats(e) == (self.utc(2100, 1, 3, 9), self.utc(2100, 1, 3, 10), 1)
+        assert e.next_occurrence().start_time == self.utc(2100, 1, 3, 9)
+
+    def test_bulk_and_repair(self, group_default):
+        group = group_default()
+        past, future = create_events_bulk(
+            [
+                dict(
+                    title="past",
+                    event_type=None,
+                    group=group,
+                    start_time=datetime(2008, 1, 1, 9),
+                    freq=rrule.DAILY,
+                    count=3,
+                ),
+                dict(
+                    title="future",
+                    event_type=None,
+                    group=group,
+                    start_time=datetime(2100, 1, 1, 9),
+                ),
+            ]
+        )[0]
+        assert self.stats(past) == (None, self.utc(2008, 1, 3, 10), 3)
+        assert self.stats(future) == (
+            self.utc(2100, 1, 1, 9),
+            self.utc(2100, 1, 1, 10),
+            1,
+        )
+
+        Event.objects.update(next_start=self.utc(2000, 1, 1), occurrence_count=0)
+        out = StringIO()
+        call_command("jivetime_refresh_stats", stdout=out)
+        assert out.getvalue().strip() == "Refreshed 2 event(s)."
+        assert self.stats(past) == (None, self.utc(2008, 1, 3, 10), 3)
+        assert self.stats(future)[0] == self.utc(2100, 1, 1, 9)
+
+
+@pytest.mark.django_db
+class TestAgenda:
+    def test_pages(self, client, group_default, monkeypatch, django_assert_num_queries):
+        monkeypatch.setattr(jivetime_settings, "PAGE_SIZE", 2)
+        group = group_default()
+        other = EventGroup.objects.create(
+            name="other", owner=group.owner, timezone="UTC"
+        )
+        now = datetime.now(timezone.utc).replace(tzinfo=None, microsecond=0)
+        for title, hour in [("past", -50), ("alpha", 3), ("bravo", 1)]:
+            create_event(
+                title,
+                ("agn", "Agenda"),
+                group,
+                start_time=now + timedelta(hours=hour),
+                freq=rrule.DAILY,
+                count=2,
+            )
+        create_event("other", ("agn", "Agenda"), other, start_time=now)
+
+        url = reverse("jivetime:calendar-agenda-api", args=[group.id])
+        titles = []
+        params = {}
+        while True:
+            with django_assert_num_queries(2):
+                r = client.get(url, params)
+            data = r.json()
+            titles.extend(o["title"] for o in data["occurrences"])
+            if not data["cursor"]:
+                break
+            params = {"after": data["cursor"]}
+
+        assert titles == ["bravo", "alpha", "bravo", "alpha"]
+        assert client.get(url, {"after": "!"}).status_code == 400
+
+        r = client.get(reverse("jivetime:calendar-agenda", args=[group.id]))
+        assert r.status_code == 200
+        assert [o.title for o in r.context["occurrences"]] == ["bravo", "alpha"]
+        assert r.context["next_cursor"]
+
+    def test_upcoming_occurrences_is_aware(self, group_default):
+        start = datetime.now(timezone.utc) + timedelta(minutes=30)
+        e = create_event(
+            "soon",
+            ("agn", "Agenda"),
+            group_default(),
+            start_time=start.replace(tzinfo=None),
+        )
+        assert e.next_occurrence() == e.occurrence_set.get()
+
+
+@pytest.mark.django_db
+class TestReminders:
+    @pytest.fixture
+    def soon(self, group_default):
+        now = datetime.now(timezone.utc).replace(tzinfo=None, microsecond=0)
+        group = group_default()
+        for title, minutes in [("past", -10), ("soon", 10), ("later", 120)]:
+            create_event(
+                title,
+                ("rmd", "Reminder"),
+                group,
+                start_time=now + timedelta(minutes=minutes),
+            )
+        return Occurrence.objects.get(event__title="soon")
+
+    def scheduler(self, backend):
+        return ReminderScheduler(
+            backend, leads=[timedelta(minutes=15)], horizon=timedelta(minutes=5)
+        )
+
+    def test_delivers_once(self, soon):
+        sent = []
+        with self.scheduler(lambda o, lead: sent.append((o, lead))) as first:
+            with self.scheduler(lambda o, lead: sent.append((o, lead))) as second:
+                assert first.load() == 1
+                assert first.load() == 0
+                assert second.load() == 1
+                assert first.run_pending() == 1
+                assert second.run_pending() == 0
+                assert second.load() == 0
+
+        assert sent == [(soon, timedelta(minutes=15))]
+        delivery = ReminderDelivery.objects.get()
+        assert delivery.status == ReminderDelivery.SENT
+        assert delivery.delivered is not None
+
+    def test_failed_delivery(self, soon):
+        def fail(occurrence, lead):
+            raise RuntimeError("unreachable")
+
+        with self.scheduler(fail) as scheduler:
+            scheduler.load()
+            assert scheduler.run_pending() == 0
+
+        assert ReminderDelivery.objects.get().status == ReminderDelivery.FAILED
+
+        sent = []
+        with self.scheduler(lambda o, lead: sent.append(o)) as scheduler:
+            assert scheduler.load() == 1
+            assert scheduler.run_pending() == 1
+
+        assert sent == [soon]
+        assert ReminderDelivery.objects.get().status == ReminderDelivery.SENT
+
+    def test_stale_claim(self, soon):
+        delivery = ReminderDelivery.objects.create(
+            occurrence=soon, lead=timedelta(minutes=15), claim="crashed"
+        )
+        sent = []
+        with self.scheduler(lambda o, lead: sent.append(o)) as scheduler:
+            assert scheduler.load() == 0
+
+        ReminderDelivery.objects.filter(pk=delivery.pk).update(
+            claimed=delivery.claimed - timedelta(minutes=10)
+        )
+        with self.scheduler(lambda o, lead: sent.append(o)) as scheduler:
+            assert scheduler.load() == 1
+            assert scheduler.run_pending() == 1
+
+        assert sent == [soon]
+        assert ReminderDelivery.objects.get().status == ReminderDelivery.SENT
+
+    def test_shifted_occurrence(self, soon):
+        sent = []
+        with self.scheduler(lambda o, lead: sent.append(o)) as scheduler:
+            assert scheduler.load() == 1
+            soon.event.shift_occurrences(timedelta(days=1))
+            assert scheduler.run_pending() == 0
+            assert not ReminderDelivery.objects.exists()
+
+            due = scheduler.next_due()
+            assert due == soon.start_time + timedelta(days=1, minutes=-15)
+            assert scheduler.run_pending(due) == 1
+
+        assert sent[0].start_time == soon.start_time + timedelta(days=1)
+
+    def test_command(self, soon, monkeypatch):
+        monkeypatch.setattr(
+            jivetime_settings, "REMINDER_LEADS", (timedelta(minutes=15),)
+        )
+        out = StringIO()
+        call_command("jivetime_reminders", "--once", stdout=out)
+        assert out.getvalue().strip() == "Sent 1 reminder(s)."
+        assert ReminderDelivery.objects.get().occurrence == soon
+
+
+@pytest.mark.django_db
+class TestPurge:
+    def test_purge_command(self, group_default):
+        group = group_default()
+        other = EventGroup.objects.create(
+            name="other", owner=group.owner, timezone="UTC"
+        )
+        old = create_event(
+            "old",
+            ("old", "Old"),
+            group,
+            start_time=datetime(2008, 1, 1, 9),
+            freq=rrule.DAILY,
+            count=3,
+        )
+        kept = create_event(
+            "kept", ("old", "Old"), other, start_time=datetime(2008, 1, 1, 9)
+        )
+        recent = create_event(
+            "recent", ("old", "Old"), group, start_time=datetime(2100, 1, 1)
+        )
+        occurrence = old.occurrence_set.first()
+        occurrence.notes.create(note="gone")
+        ReminderDelivery.objects.create(occurrence=occurrence, lead=timedelta(0))
+
+        out = StringIO()
+        args = ["--before", "2020-01-01", "--group", str(group.id)]
+        call_command("jivetime_purge_occurrences", *args, "--dry-run", stdout=out)
+        assert out.getvalue().startswith("3 occurrence(s)")
+        assert old.occurrence_set.count() == 3
+
+        out = StringIO()
+        call_command(
+            "jivetime_purge_occurrences",
+            *args,
+            "--batch-size=2",
+            "--sleep=0",
+            stdout=out,
+        )
+        assert out.getvalue().startswith("Deleted 3 occurrence(s)")
+        assert "rows/sec" in out.getvalue()
+        assert not old.occurrence_set.exists()
+        assert not Note.objects.filter(object_id=occurrence.pk).exists()
+        assert not ReminderDelivery.objects.exists()
+        assert Event.objects.get(pk=old.pk).occurrence_count == 0
+        assert kept.occurrence_set.count() == 1
+        assert recent.occurrence_set.count() == 1
+
+
+@pytest.mark.django_db
+class TestArchive:
+    def test_archive_and_read(self, client, group_default, django_assert_num_queries):
+        group = group_default()
+        old = create_event(
+            "old",
+            ("old", "Old"),
+            group,
+            start_time=datetime(2008, 1, 1, 9),
+            freq=rrule.DAILY,
+            count=2,
+        )
+        create_event("recent", ("old", "Old"), group, start_time=datetime(2100, 1, 1))
+        old.occurrence_set.first().notes.create(note="kept")
+
+        out = StringIO()
+        call_command(
+            "jivetime_purge_occurrences",
+            "--archive",
+            "--before=2020-01-01",
+            "--sleep=0",
+            stdout=out,
+        )
+        assert out.getvalue().startswith("Archived 2 occurrence(s)")
+        assert OccurrenceArchive.objects.count() == 2
+        assert Occurrence.objects.count() == 1
+        assert OccurrenceArchive.objects.first().notes.get().note == "kept"
+        assert archive_cutoff() == datetime(2008, 1, 2, 10, tzinfo=timezone.utc)
+
+        start = datetime(2008, 1, 1, tzinfo=timezone.utc)
+        with django_assert_num_queries(1):
+            found = list(
+                Occurrence.objects.range_occurrences(
+                    start, start + timedelta(days=7), group
+                )
+            )
+        assert [(o.title, o.start_time.day) for o in found] == [("old", 1), ("old", 2)]
+        busy = list(utils.iter_busy(group, start, start + timedelta(days=7)))
+        assert len(busy) == 2
+
+        start = datetime(2100, 1, 1, tzinfo=timezone.utc)
+        with django_assert_num_queries(1) as ctx:
+            found = list(
+                Occurrence.objects.range_occurrences(
+                    start, start + timedelta(days=7), group
+                )
+            )
+        assert [o.title for o in found] == ["recent"]
+        assert "occurrencearchive" not in ctx.captured_queries[0]["sql"]
+
+        r = client.get(reverse("jivetime:calendar-year", args=[group.id, 2008]))
+        assert r.status_code == 200
+        assert len(r.context["by_month"][date(2008, 1, 1)]) == 2
+
+        r = client.get(reverse("jivetime:calendar-month", args=[group.id, 2008, 1]))
+        assert r.status_code == 200
+        items = [o for row in r.context["calendar_data"] for d, day in row for o in day]
+        assert [o.archived for o in items] == [True, True]
+        assert items[0].get_absolute_url() == old.get_absolute_url()
+
+        table = utils.create_timeslot_table(
+            datetime(2008, 1, 1),
+            group.id,
+            start_time=time(9, tzinfo=timezone.utc),
+            end_time_delta=timedelta(hours=2),
+        )
+        cells = {cell for tm, cells in table for cell in cells if cell}
+        assert [(o.title, o.archived) for o in cells] == [("old", True)]
+
+        r = client.get(old.get_absolute_url())
+        assert r.context["archived_stats"]["count"] == 2
+        assert "2 archived occurrences" in r.content.decode()
+
+    def test_archive_clash(self, group_default):
+        old = create_event(
+            "old",
+            ("old", "Old"),
+            group_default(),
+            start_time=datetime(2008, 1, 1, 9),
+            freq=rrule.DAILY,
+            count=2,
+        )
+        first = old.occurrence_set.first()
+        OccurrenceArchive.objects.create(
+            id=first.id,
+            event=old,
+            start_time=first.start_time,
+            end_time=first.end_time,
+        )
+
+        before = datetime(2020, 1, 1, tzinfo=timezone.utc)
+        with pytest.raises(IntegrityError):
+            list(purge_occurrences(before, archive=True))
+        assert old.occurrence_set.count() == 2
+
+
+@pytest.mark.django_db
+class TestEventTypeRegistry:
+    def test_lookups(self, play_type, work_type, django_assert_num_queries):
+        event_types.get(play_type.pk)
+        with django_assert_num_queries(0):
+            assert event_types.get(play_type.pk) == play_type
+            assert event_types.get_by_abbr("work") == work_type
+            assert [et.abbr for et in event_types.all()] == ["play", "work"]
+
+        work_type.label = "Labour"
+        work_type.save()
+        assert event_types.get_by_abbr("work").label == "Labour"
+
+    def test_create_event_and_form(
+        self, play_type, group_default, django_assert_num_queries
+    ):
+        group = group_default()
+        event_types.all()
+        with django_assert_num_queries(4):
+            # the event and occurrence inserts, then the occurrence stats refresh
+            e = create_event("cached", ("play", "Play"), group)
+        assert e.event_type == play_type
+
+        data = dict(
+            title="form",
+            group=group.id,
+            event_type=play_type.id,
+            url="http://example.com",
+        )
+        with django_assert_num_queries(3):
+            # the group lookup, and the model validation of both foreign keys,
+            # which catches event types deleted since the registry was loaded
+            form = EventForm(data)
+            assert form.is_valid(), form.errors
+        assert form.cleaned_data["event_type"] == play_type
+        assert not EventForm(dict(data, event_type=999)).is_valid()
+
+
+@pytest.mark.django_db
+class TestNotes:
+    def test_prefetch_and_count(self, events, django_assert_num_queries):
+        for e in events.filter(title__in=["alpha", "bravo"]):
+            e.notes.create(note="one")
+            e.notes.create(note="two")
+            e.occurrence_set.get().notes.create(note="occurrence")
+
+        with django_assert_num_queries(2):
+            notes = {e.title: len(e.notes.all()) for e in Event.objects.with_notes()}
+        assert notes["alpha"] == 2
+        assert notes["echo"] == 0
+
+        with django_assert_num_queries(1):
+            counts = {e.title: e.note_count for e in Event.objects.with_note_count()}
+        assert counts == dict(dict.fromkeys(counts, 0), alpha=2, bravo=2)
+
+        occurrences = Occurrence.objects.with_note_count()
+        assert sorted(o.note_count for o in occurrences) == [0] * 5 + [1, 1]
+
+
+@pytest.mark.django_db
+class TestEventListing:
+    def test_keyset_pages(self, client, events, group_default, monkeypatch):
+        monkeypatch.setattr(jivetime_settings, "PAGE_SIZE", 3)
+        other = EventGroup.objects.create(
+            name="other", owner=group_default().owner, timezone="UTC"
+        )
+        Event.objects.create(title="aardvark", group=other)
+        url = reverse("jivetime:event-list", args=[group_default().id])
+
+        titles = []
+        params = {}
+        while True:
+            r = client.get(url, params)
+            assert r.status_code == 200
+            titles.append([e.title for e in r.context["events"]])
+            if not r.context["next_cursor"]:
+                break
+            params = {"after": r.context["next_cursor"]}
+
+        assert titles == [
+            ["alpha", "bravo", "charlie"],
+            ["delta", "echo", "foxtrot"],
+            ["zelda"],
+        ]
+        assert client.get(url, {"after": "!"}).status_code == 400
+        for cursor in (utils.encode_cursor("a"), utils.encode_cursor("a", "zz")):
+            assert client.get(url, {"after": cursor}).status_code == 400
+
+    def test_next_start(self, group_default):
+        e = create_event(
+            "Weekly",
+            ("wkly", "Weekly"),
+            group_default(),
+            start_time=datetime(2008, 1, 1, 9),
+            freq=rrule.WEEKLY,
+            count=4,
+        )
+        now = datetime(2008, 1, 10, tzinfo=timezone.utc)
+        assert Event.objects.filter(pk=e.pk).refresh_occurrence_stats(now) == 1
+        event = Event.objects.get(pk=e.pk)
+        assert event.next_start == datetime(2008, 1, 15, 9, tzinfo=timezone.utc)
+        assert event.last_end == datetime(2008, 1, 22, 10, tzinfo=timezone.utc)
+        assert event.occurrence_count == 4
+
+
+@pytest.mark.django_db(databases=["default", "replica"])
+class TestReplicaRouting:
+    @pytest.fixture(autouse=True)
+    def replica(self, settings, monkeypatch):
+        settings.DATABASE_ROUTERS = ["jivetime.routers.ReplicaRouter"]
+        monkeypatch.setattr(jivetime_settings, "REPLICA_DATABASE", "replica")
+
+    def test_reads_from_replica(self, client, occurrence, group_default):
+        group = group_default()
+        url = reverse("jivetime:calendar-free-busy", args=[group.id])
+        params = {"start": "2018-03-18T00:00:00Z", "end": "2018-03-19T00:00:00Z"}
+        # the replica has not caught up with the primary yet
+        assert client.get(url, params).status_code == 404
+
+        owner = User.objects.using("replica").create(id=group.owner_id, username="test")
+        EventGroup.objects.using("replica").create(
+            id=group.id, name=group.name, owner=owner, timezone="UTC"
+        )
+        r = client.get(url, params)
+        assert r.status_code == 200
+        assert r.json()["busy"] == []
+        assert Occurrence.objects.count() == 1
+
+    def test_writes_pin_primary(self, client, occurrence, group_default):
+        gid = group_default().id
+        url = reverse("jivetime:event-detail", args=[gid, occurrence.event.id])
+        r = client.get(url)
+        assert r.status_code == 200
+        assert "jivetime_primary" not in r.cookies
+
+        r = client.post(url, {"_shift": "", "delta": "01:00:00"})
+        assert r.status_code == 302
+        cookie = r.cookies["jivetime_primary"]
+        assert cookie["max-age"] == jivetime_settings.READ_YOUR_WRITES_SECONDS
+
+        r = client.get(reverse("jivetime:calendar-agenda-api", args=[gid]))
+        assert r.status_code == 200
+
+    def test_disabled(self, client, occurrence, group_default, monkeypatch):
+        monkeypatch.setattr(jivetime_settings, "REPLICA_DATABASE", None)
+        gid = group_default().id
+        r = client.get(reverse("jivetime:calendar-agenda-api", args=[gid]))
+        assert r.status_code == 200
+
+        url = reverse("jivetime:event-detail", args=[gid, occurrence.event.id])
+        r = client.post(url, {"_shift": "", "delta": "01:00:00"})
+        assert "jivetime_primary" not in r.cookies
+
+
+@pytest.mark.django_db(databases=["default", "shard"])
+class TestSharding:
+    @pytest.fixture(autouse=True)
+    def shards(self, settings, monkeypatch, group_default, unconstrained_shard):
+        settings.DATABASE_ROUTERS = ["jivetime.routers.GroupShardRouter"]
+        monkeypatch.setattr(
+            jivetime_settings, "SHARD_MAP", {group_default().id: "shard"}
+        )
+
+    def create(self, group):
+        event = create_event(
+            "Weekly",
+            ("wkly", "Weekly"),
+            group,
+            start_time=datetime(2008, 1, 1, 9),
+            note="event note",
+            freq=rrule.WEEKLY,
+            count=4,
+        )
+        event.occurrence_set.first().notes.create(note="occurrence note")
+        return event
+
+    def test_shard_for_group(self, monkeypatch, group_default):
+        assert shard_for_group(group_default()) == "shard"
+        monkeypatch.setattr(jivetime_settings, "SHARDS", ["default", "shard"])
+        assert {shard_for_group(pk) for pk in range(2, 20)} == {"default", "shard"}
+        assert shard_for_group(7) == shard_for_group(EventGroup(pk=7))
+
+    def test_routing(self, client, group_default):
+        group = group_default()
+        event = self.create(group)
+        assert event._state.db == "shard"
+        assert not Event.objects.using("default").exists()
+        assert Occurrence.objects.using("shard").count() == 4
+        assert Note.objects.using("shard").count() == 2
+        assert group.event_set.get() == event
+
+        start = datetime(2008, 1, 1, tzinfo=timezone.utc)
+        end = datetime(2008, 2, 1, tzinfo=timezone.utc)
+        assert not Occurrence.objects.range_occurrences(start, end, group).exists()
+        with using_group(group):
+            assert Occurrence.objects.range_occurrences(start, end, group).count() == 4
+
+        assert event.shift_occurrences(timedelta(hours=1)) == 4
+        url = reverse("jivetime:event-detail", args=[group.id, event.id])
+        r = client.get(url)
+        assert r.status_code == 200
+        assert r.context["event"].occurrence_count == 4
+
+        r = client.get(
+            reverse("jivetime:calendar-free-busy", args=[group.id]),
+            {"start": start.isoformat(), "end": end.isoformat()},
+        )
+        assert r.json()["busy"][0] == [
+            "2008-01-01T10:00:00+00:00",
+            "2008-01-01T11:00:00+00:00",
+        ]
+
+    def test_bulk_across_shards(self, play_type, group_default):
+        other = EventGroup.objects.create(
+            name="other", owner=group_default().owner, timezone="UTC"
+        )
+        specs = [
+            dict(title=title, event_type=play_type, group=group, note=title)
+            for title, group in (("one", group_default()), ("two", other))
+        ]
+        events, timings = create_events_bulk(specs)
+        assert [e.title for e in events] == ["one", "two"]
+        assert [e._state.db for e in events] == ["shard", "default"]
+        assert Occurrence.objects.using("shard").get().event_id == events[0].pk
+        assert Note.objects.using("default").get().note == "two"
+
+    def test_commands(self, monkeypatch, group_default):
+        group = group_default()
+        self.create(group)
+        now = datetime.now(timezone.utc).replace(tzinfo=None, microsecond=0)
+        soon = create_event(
+            "soon", ("rmd", "Reminder"), group, start_time=now + timedelta(minutes=10)
+        )
+        weekly = create_event(
+            "open",
+            ("wkly", "Weekly"),
+            group,
+            start_time=now + timedelta(days=2),
+            freq=rrule.WEEKLY,
+        )
+        assert not Event.objects.using("default").exists()
+
+        Event.objects.using("shard").update(occurrence_count=0)
+        out = StringIO()
+        call_command("jivetime_refresh_stats", "--all", stdout=out)
+        assert out.getvalue().strip() == "Refreshed 3 event(s)."
+        assert Event.objects.using("shard").get(pk=soon.pk).occurrence_count == 1
+
+        monkeypatch.setattr(
+            jivetime_settings, "REMINDER_LEADS", (timedelta(minutes=15),)
+        )
+        out = StringIO()
+        call_command("jivetime_reminders", "--once", stdout=out)
+        assert out.getvalue().strip() == "Sent 1 reminder(s)."
+        delivery = ReminderDelivery.objects.using("shard").get()
+        assert delivery.occurrence.event == soon
+
+        count = weekly.occurrence_set.count()
+        monkeypatch.setattr(
+            jivetime_settings,
+            "MATERIALIZE_HORIZON",
+            jivetime_settings.MATERIALIZE_HORIZON + timedelta(weeks=2),
+        )
+        out = StringIO()
+        call_command("jivetime_extend_series", stdout=out)
+        assert out.getvalue().strip() == "Created 2 occurrence(s) for 1 series."
+        assert weekly.occurrence_set.count() == count + 2
+
+        out = StringIO()
+        call_command(
+            "jivetime_purge_occurrences", "--before=2008-01-10", "--sleep=0", stdout=out
+        )
+        assert out.getvalue().startswith("Deleted 2 occurrence(s)")
+        assert (
+            Occurrence.objects.using("shard").filter(event__title="Weekly").count() == 2
+        )
+
+    def test_free_slots_across_shards(self, group_default):
+        other = EventGroup.objects.create(
+            name="other", owner=group_default().owner, timezone="UTC"
+        )
+        for title, group, hour in (("one", group_default(), 9), ("two", other, 10)):
+            create_event(
+                title,
+                ("busy", "Busy"),
+                group,
+                start_time=datetime(2008, 1, 1, hour),
+            )
+
+        window = (
+            datetime(2008, 1, 1, 9, tzinfo=timezone.utc),
+            datetime(2008, 1, 1, 12, tzinfo=timezone.utc),
+        )
+        slots = utils.find_free_slots(
+            [group_default(), other], timedelta(hours=1), window
+        )
+        assert [st.hour for st, et in slots] == [11]
+
+    def test_move_group(self, monkeypatch, group_default):
+        group = group_default()
+        event = self.create(group)
+        event.occurrence_set.first().reminderdelivery_set.create(
+            lead=timedelta(minutes=15)
+        )
+
+        out = StringIO()
+        call_command("jivetime_move_group", group.id, "default", stdout=out)
+        assert "Copied 9 row(s)" in out.getvalue()
+        with pytest.raises(CommandError):
+            call_command("jivetime_move_group", group.id, "shard", "--purge")
+
+        monkeypatch.setattr(jivetime_settings, "SHARD_MAP", {})
+        call_command(
+            "jivetime_move_group",
+            group.id,
+            "default",
+            "--purge",
+            "--source=shard",
+            "--sleep=0",
+            stdout=out,
+        )
+        assert not Occurrence.objects.using("shard").exists()
+        assert not Note.objects.using("shard").exists()
+
+        event = group.event_set.get()
+        assert event._state.db == "default"
+        assert event.notes.get().note == "event note"
+        first = event.occurrence_set.first()
+        assert first.notes.get().note == "occurrence note"
+        assert ReminderDelivery.objects.get().occurrence == first
+        assert event.occurrence_set.count() == event.occurrence_count == 4
+
+    def test_move_archived_group(self, group_default):
+        group = group_default()
+        self.create(group)
+        before = datetime(2008, 1, 10, tzinfo=timezone.utc)
+        assert sum(purge_occurrences(before, archive=True, using="shard")) == 2
+        archived = OccurrenceArchive.objects.using("shard")
+        ids = set(archived.values_list("pk", flat=True))
+
+        # the target archive already holds rows with the same primary keys
+        other = EventGroup.objects.create(
+            name="other", owner=group.owner, timezone="UTC"
+        )
+        other_event = create_event(
+            "other", ("oth", "Other"), other, start_time=datetime(2007, 1, 1, 9)
+        )
+        for obj in archived:
+            OccurrenceArchive.objects.using("default").create(
+                id=obj.pk,
+                event=other_event,
+                start_time=obj.start_time,
+                end_time=obj.end_time,
+            )
+
+        call_command("jivetime_move_group", group.id, "default", stdout=StringIO())
+        moved = OccurrenceArchive.objects.using("default").filter(event__group=group)
+        assert moved.count() == 2
+        moved_ids = set(moved.values_list("pk", flat=True))
+        assert not ids & moved_ids
+        assert not moved_ids & set(Occurrence.objects.values_list("pk", flat=True))
+        assert moved.first().notes.get().note == "occurrence note"
+
+
+@pytest.mark.django_db
+class TestServerTiming:
+    def test_middleware(self, client, occurrence, group_default, caplog):
+        gid = group_default().id
+        caplog.set_level("INFO", logger="jivetime.timing")
+        r = client.get(reverse("jivetime:calendar-day", args=[gid, 2018, 3, 18]))
+        assert r.status_code == 200
+        metrics = [m.split(";")[0] for m in r["Server-Timing"].split(", ")]
+        assert {"db", "timeslots", "render", "total"} <= set(metrics)
+
+        data = caplog.records[-1].jivetime_timing
+        assert data["view"] == "jivetime:calendar-day"
+        assert data["group"] == str(gid)
+        assert data["queries"] > 0
+        assert data["timeslots_ms"] >= 0
+
+        r = client.get("/")
+        assert not r.has_header("Server-Timing")
+
+    def test_decorator(self, rf, group_default):
+        gid = group_default().id
+        request = rf.get("/")
+        request.resolver_match = ResolverMatch(
+            views.conflicts_view,
+            (),
+            {"gid": gid},
+            url_name="calendar-conflicts",
+            app_names=["jivetime"],
+            namespaces=["jivetime"],
+        )
+        r = server_timing(views.conflicts_view)(request, gid=gid)
+        assert r["Server-Timing"].startswith("db;dur=")
+        assert ' queries", total;dur=' in r["Server-Timing"]
+
+
+@pytest.mark.django_db
+class TestMetrics:
+    def test_occurrence_metrics(self, metrics, group_default):
+        group = group_default()
+        create_event(
+            "Daily",
+            ("dly", "Daily"),
+            group,
+            start_time=datetime(2008, 1, 1, 9),
+            freq=rrule.DAILY,
+            count=4,
+        )
+        assert metrics.value("jivetime_occurrences_created_total", group=group.id) == 4
+        assert metrics.value("jivetime_occurrences_per_call") == 1
+        assert metrics.value("jivetime_rrule_expansion_seconds") == 1
+
+    def test_query_and_cache_metrics(self, client, metrics, events, group_default):
+        group = group_default()
+        start = datetime(2008, 12, 11, tzinfo=timezone.utc)
+        end = datetime(2008, 12, 12, tzinfo=timezone.utc)
+        utils.free_busy(group, start, end)
+        utils.free_busy(group, start, end)
+        requests = "jivetime_cache_requests_total"
+        assert metrics.value(requests, cache="free_busy", result="miss") == 1
+        assert metrics.value(requests, cache="free_busy", result="hit") == 1
+
+        r = client.get(reverse("jivetime:calendar-day", args=[group.id, 2008, 12, 11]))
+        assert r.status_code == 200
+        for scope in ("free_busy", "day"):
+            assert metrics.value("jivetime_range_query_seconds", scope=scope) == 1
+        assert metrics.value("jivetime_timeslot_table_cells") == 1
+
+    def test_endpoint(self, client, metrics):
+        metrics.increment("jivetime_test_total", group=1)
+        metrics.observe("jivetime_occurrences_per_call", 4)
+        r = client.get(reverse("jivetime:metrics"))
+        assert r.status_code == 200
+        assert r["Content-Type"].startswith("text/plain; version=0.0.4")
+
+        lines = r.content.decode().splitlines()
+        assert "# TYPE jivetime_test_total counter" in lines
+        assert 'jivetime_test_total{group="1"} 1' in lines
+        assert "# TYPE jivetime_occurrences_per_call histogram" in lines
+        assert 'jivetime_occurrences_per_call_bucket{le="1"} 0' in lines
+        assert 'jivetime_occurrences_per_call_bucket{le="10"} 1' in lines
+        assert 'jivetime_occurrences_per_call_bucket{le="+Inf"} 1' in lines
+        assert "jivetime_occurrences_per_call_sum 4" in lines
+        assert "jivetime_occurrences_per_call_count 1" in lines
+
+    def test_endpoint_not_exposed(self, client, monkeypatch):
+        monkeypatch.setattr("jivetime.metrics._metrics", Metrics())
+        assert client.get(reverse("jivetime:metrics")).status_code == 404
+
+
+@pytest.mark.django_db
+class TestProfiling:
+    @pytest.fixture
+    def profile_dir(self, tmp_path, monkeypatch):
+        monkeypatch.setattr(jivetime_settings, "PROFILE_DIR", str(tmp_path))
+        return tmp_path
+
+    def metadata(self, profile_dir):
+        return [json.loads(p.read_text()) for p in sorted(profile_dir.glob("*.json"))]
+
+    def test_sampled(self, client, occurrence, profile_dir, monkeypatch):
+        monkeypatch.setattr(jivetime_settings, "PROFILE_SAMPLE_RATE", 1.0)
+        gid = occurrence.event.group_id
+        r = client.get(reverse("jivetime:calendar-day", args=[gid, 2018, 3, 18]))
+        assert r.status_code == 200
+        client.get("/")
+
+        [data] = self.metadata(profile_dir)
+        assert data["view"] == "jivetime:calendar-day"
+        assert data["scope"] == "day"
+        assert data["group"] == gid
+        assert data["reason"] == "sampled"
+        assert (profile_dir / data["profile"]).exists()
+
+        out = StringIO()
+        call_command(
+            "jivetime_profile_summary",
+            "--group",
+            str(gid),
+            "--limit",
+            "500",
+            stdout=out,
+        )
+        assert "Summarized 1 profile(s)" in out.getvalue()
+        assert "jivetime:calendar-day: 1 profile(s)" in out.getvalue()
+        assert "create_timeslot_table" in out.getvalue()
+
+        out = StringIO()
+        call_command("jivetime_profile_summary", "--group", "999", stdout=out)
+        assert "Summarized 0 profile(s)" in out.getvalue()
+
+    def test_threshold(self, client, group_default, profile_dir, monkeypatch):
+        url = reverse("jivetime:calendar-year", args=[group_default().id, 2018])
+        client.get(url)
+        assert self.metadata(profile_dir) == []
+
+        monkeypatch.setattr(jivetime_settings, "PROFILE_THRESHOLD", 60)
+        client.get(url)
+        assert self.metadata(profile_dir) == []
+
+        monkeypatch.setattr(jivetime_settings, "PROFILE_THRESHOLD", 0)
+        client.get(url)
+        [data] = self.metadata(profile_dir)
+        assert data["reason"] == "slow"
+        assert data["scope"] == "year"
+
+    def test_tracemalloc(self, client, group_default, profile_dir, monkeypatch):
+        monkeypatch.setattr(jivetime_settings, "PROFILE_SAMPLE_RATE", 1.0)
+        monkeypatch.setattr(jivetime_settings, "PROFILER", "tracemalloc")
+        r = client.get(reverse("jivetime:event-list", args=[group_default().id]))
+        assert r.status_code == 200
+
+        [data] = self.metadata(profile_dir)
+        assert data["profile"].endswith(".snapshot")
+        assert data["scope"] is None
+
+        out = StringIO()
+        call_command("jivetime_profile_summary", stdout=out)
+        assert "Top allocating lines:" in out.getvalue()
+        assert " KiB  " in out.getvalue()
+
+    def test_disabled(self, client, group_default, monkeypatch):
+        monkeypatch.setattr(jivetime_settings, "PROFILE_SAMPLE_RATE", 1.0)
+        r = client.get(reverse("jivetime:calendar-today", args=[group_default().id]))
+        assert r.status_code == 200
+        with pytest.raises(CommandError):
+            call_command("jivetime_profile_summary")
+
+
 class TestMisc:
     def test_month_boundaries(self):
         dt = datetime(2012, 2, 15)